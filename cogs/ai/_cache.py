@@ -0,0 +1,111 @@
+import hashlib
+import random
+import re
+import time
+from collections import OrderedDict, defaultdict
+
+# Подпись автора, которую process_batch ставит перед каждой строкой пачки
+AUTHOR_PREFIX = re.compile(r"^[^:\n]{1,40}:\s*", re.MULTILINE)
+NON_WORD = re.compile(r"[^\w\s]+")
+SPACES = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    """«Бот, ты тут??» и «бот ты тут» дают один ключ: без подписей, регистра, знаков и лишних пробелов."""
+    text = AUTHOR_PREFIX.sub("", text.lower())
+    return SPACES.sub(" ", NON_WORD.sub(" ", text)).strip()
+
+
+class CacheEntry:
+    def __init__(self, reply: str, expires: float):
+        self.replies = [reply]
+        self.expires = expires
+        self.uses = 0
+
+
+class ResponseCache:
+    """Кэш ответов на повторяющиеся короткие реплики.
+
+    Ключ — хэш системного промпта, конспекта разговора (или его отсутствия) и последних key_turns
+    нормализованных реплик. Короткое «да» или «а почему?» без контекста не ключ: ответ на него
+    зависит от того, что было до, поэтому совпасть должна вся недавняя история.
+    Чтобы ответы не казались заготовкой, запись отдаётся не больше max_uses раз и только
+    с вероятностью reuse_probability; в остальных случаях идёт запрос к модели,
+    и новый ответ добавляется к вариантам записи (до max_variants).
+    """
+
+    def __init__(self, max_entries: int = 500, ttl: float = 600.0, key_turns: int = 3, max_prompt_chars: int = 60,
+                 max_uses: int = 5, max_variants: int = 3, reuse_probability: float = 0.7):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.key_turns = key_turns
+        self.max_prompt_chars = max_prompt_chars
+        self.max_uses = max_uses
+        self.max_variants = max_variants
+        self.reuse_probability = reuse_probability
+        self.entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        # Метрики по каналам: [попаданий, обращений]
+        self.stats: defaultdict[int, list[int]] = defaultdict(lambda: [0, 0])
+
+    def key(self, system_prompt: str, messages: list[dict]) -> str | None:
+        """None — реплики чата слишком длинные, такие почти не повторяются и не кэшируются."""
+        summary = "\n".join(m["content"] for m in messages if m["role"] == "system")
+        turns = [m for m in messages if m["role"] != "system"][-self.key_turns:]
+        if not turns or turns[-1]["role"] != "user":
+            return None
+        normalized = [f"{m['role']}:{normalize(m['content'])}" for m in turns]
+        if any(m["role"] == "user" and len(turn) > self.max_prompt_chars for m, turn in zip(turns, normalized)):
+            return None
+        digest = hashlib.sha256(system_prompt.encode())
+        digest.update(b"\0summary:" + summary.encode())
+        for turn in normalized:
+            digest.update(b"\0" + turn.encode())
+        return digest.hexdigest()
+
+    def get(self, channel_id: int, key: str | None) -> str | None:
+        if key is None:
+            return None
+        stats = self.stats[channel_id]
+        stats[1] += 1
+
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires <= time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        if entry.uses >= self.max_uses or random.random() > self.reuse_probability:
+            return None
+
+        entry.uses += 1
+        stats[0] += 1
+        return random.choice(entry.replies)
+
+    def put(self, key: str | None, reply: str):
+        if key is None or not reply or reply.startswith("⚠️"):
+            return
+        entry = self.entries.get(key)
+        if entry is not None and entry.expires > time.monotonic():
+            if len(entry.replies) < self.max_variants:
+                entry.replies.append(reply)
+            self.entries.move_to_end(key)
+            return
+
+        self.entries[key] = CacheEntry(reply, time.monotonic() + self.ttl)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def forget_channel(self, channel_id: int):
+        self.stats.pop(channel_id, None)
+
+    def summary(self) -> str:
+        hits = sum(h for h, _ in self.stats.values())
+        lookups = sum(n for _, n in self.stats.values())
+        if not lookups:
+            return f"записей {len(self.entries)}, обращений не было"
+        lines = [f"записей {len(self.entries)}, попаданий {hits}/{lookups} ({hits / lookups:.0%})"]
+        busiest = sorted(self.stats.items(), key=lambda item: item[1][1], reverse=True)[:5]
+        lines += [f"<#{channel_id}>: {h}/{n} ({h / n:.0%})" for channel_id, (h, n) in busiest if n]
+        return "\n".join(lines)
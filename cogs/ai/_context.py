@@ -0,0 +1,75 @@
+import math
+
+# Грубая локальная оценка токенизатора: в среднем ~3 символа на токен для смеси кириллицы и латиницы
+CHARS_PER_TOKEN = 3.0
+# Служебные токены на каждое сообщение (роль, разделители)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return MESSAGE_OVERHEAD_TOKENS + math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    max_chars = int((max_tokens - MESSAGE_OVERHEAD_TOKENS) * CHARS_PER_TOKEN)
+    return text if len(text) <= max_chars else text[:max_chars - 1] + "…"
+
+
+def join_latest(lines: list[str], max_tokens: int) -> str:
+    """Склеивает строки в одну реплику в пределах max_tokens, сохраняя самые свежие (последние).
+
+    Старые строки, которые не влезли, отбрасываются; самая свежая при необходимости обрезается.
+    """
+    max_chars = int((max_tokens - MESSAGE_OVERHEAD_TOKENS) * CHARS_PER_TOKEN)
+    kept = []
+    used = 0
+    for line in reversed(lines):
+        if not kept:
+            line = truncate_to_tokens(line, max_tokens)
+        elif used + 1 + len(line) > max_chars:
+            break
+        kept.append(line)
+        used += len(line) + (1 if len(kept) > 1 else 0)
+    return "\n".join(reversed(kept))
+
+
+class Conversation:
+    """История одного канала: последние реплики и сжатый конспект всего, что было раньше."""
+
+    def __init__(self, history: list[dict] | None = None, summary: str = ""):
+        self.history: list[dict] = history or []
+        self.summary = summary
+
+    def add(self, role: str, content: str, max_tokens: int):
+        self.history.append({"role": role, "content": truncate_to_tokens(content, max_tokens)})
+
+
+class ContextPacker:
+    """Собирает контекст запроса в пределах бюджета токенов: конспект плюс как можно больше свежих реплик."""
+
+    def __init__(self, token_budget: int):
+        self.token_budget = token_budget
+
+    def pack(self, conversation: Conversation) -> tuple[list[dict], int]:
+        """Возвращает (сообщения для запроса, сколько старых реплик не поместилось)."""
+        budget = self.token_budget
+        prefix = []
+        if conversation.summary:
+            content = f"Краткое содержание более раннего разговора: {conversation.summary}"
+            prefix.append({"role": "system", "content": content})
+            budget -= estimate_tokens(content)
+
+        packed = []
+        for turn in reversed(conversation.history):
+            cost = estimate_tokens(turn["content"])
+            # Самую свежую реплику отправляем всегда, даже если она одна съедает бюджет
+            if cost > budget and packed:
+                break
+            packed.append(turn)
+            budget -= cost
+        packed.reverse()
+        return prefix + packed, len(conversation.history) - len(packed)
+
+
+def estimate_messages_tokens(messages: list[dict]) -> int:
+    return sum(estimate_tokens(m["content"]) for m in messages)
@@ -0,0 +1,161 @@
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager, suppress
+from datetime import datetime
+
+from database.ai.functions import ConversationDatabase
+from cogs.ai._context import Conversation
+
+
+class ConversationStore:
+    """Истории каналов в памяти с вытеснением и выгрузкой в БД.
+
+    В памяти держится не больше max_channels историй (LRU); каналы, молчащие дольше idle_ttl,
+    выгружаются. Изменённые истории сохраняются раз в flush_interval, поэтому контекст
+    переживает перезапуск. Выгруженная история поднимается из БД при следующем сообщении канала.
+    """
+
+    def __init__(self, db: ConversationDatabase, max_channels: int, idle_ttl: float, flush_interval: float):
+        self.db = db
+        self.max_channels = max_channels
+        self.idle_ttl = idle_ttl
+        self.flush_interval = flush_interval
+        self.conversations: OrderedDict[int, Conversation] = OrderedDict()
+        self.last_used: dict[int, float] = {}
+        self.dirty: set[int] = set()
+        self.in_use: set[int] = set()  # истории, с которыми сейчас идёт ответ, не вытесняются
+        # Вытесненные, но ещё не записанные истории: их и отдаём, если канал снова заговорит раньше сброса
+        self.spilled: dict[int, Conversation] = {}
+        self._writing: dict[int, Conversation] = {}  # вытесненные истории, которые прямо сейчас пишутся
+
+        # Метрики
+        self.hits = 0
+        self.rehydrated = 0
+        self.evicted = 0
+
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        await self.flush()
+
+    @asynccontextmanager
+    async def use(self, channel_id: int):
+        """Выдаёт историю канала на время ответа. После выхода она считается изменённой."""
+        conversation = await self.get(channel_id)
+        self.in_use.add(channel_id)
+        try:
+            yield conversation
+        finally:
+            self.in_use.discard(channel_id)
+            # История могла быть удалена (drop) за время ответа — тогда не оставляем по ней следов
+            if channel_id in self.conversations:
+                self.last_used[channel_id] = time.monotonic()
+                self.dirty.add(channel_id)
+
+    async def get(self, channel_id: int) -> Conversation:
+        conversation = self.conversations.get(channel_id)
+        if conversation is not None:
+            self.hits += 1
+            self.conversations.move_to_end(channel_id)
+        else:
+            conversation = (self.spilled.pop(channel_id, None) or self._writing.get(channel_id)
+                            or await self._load(channel_id))
+            self.conversations[channel_id] = conversation
+            self._evict_overflow()
+
+        self.last_used[channel_id] = time.monotonic()
+        return conversation
+
+    async def _load(self, channel_id: int) -> Conversation:
+        try:
+            row = await self.db.get_conversation(channel_id)
+        except Exception as e:
+            print(f"[Память ИИ] Не удалось загрузить историю канала {channel_id}: {e}")
+            row = None
+        if row is None:
+            return Conversation()
+        self.rehydrated += 1
+        return Conversation(list(row.history), row.summary)
+
+    def _evict(self, channel_id: int):
+        conversation = self.conversations.pop(channel_id)
+        self.last_used.pop(channel_id, None)
+        if channel_id in self.dirty:
+            self.spilled[channel_id] = conversation
+        self.evicted += 1
+
+    def _evict_overflow(self):
+        overflow = len(self.conversations) - self.max_channels
+        # Порядок LRU: самые давние в начале
+        for channel_id in list(self.conversations):
+            if overflow <= 0:
+                break
+            if channel_id not in self.in_use:
+                self._evict(channel_id)
+                overflow -= 1
+
+    def evict_idle(self):
+        deadline = time.monotonic() - self.idle_ttl
+        for channel_id in list(self.conversations):
+            if self.last_used.get(channel_id, 0) > deadline:
+                break
+            if channel_id not in self.in_use:
+                self._evict(channel_id)
+
+    async def drop(self, channel_id: int):
+        """Забывает историю канала и в памяти, и в БД."""
+        self.conversations.pop(channel_id, None)
+        self.last_used.pop(channel_id, None)
+        self.spilled.pop(channel_id, None)
+        self.dirty.discard(channel_id)
+        # Под замком, чтобы идущий сброс не записал историю обратно после удаления
+        async with self._lock:
+            try:
+                await self.db.delete_conversation(channel_id)
+            except Exception as e:
+                print(f"[Память ИИ] Не удалось удалить историю канала {channel_id}: {e}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            self.evict_idle()
+            await self.flush()
+
+    async def flush(self):
+        async with self._lock:
+            if not self.dirty:
+                return
+            dirty, self.dirty = self.dirty, set()
+            spilled, self.spilled = self.spilled, {}
+            self._writing = spilled
+            now = datetime.utcnow()
+            rows = []
+            for channel_id in dirty:
+                conversation = self.conversations.get(channel_id) or spilled.get(channel_id)
+                if conversation is not None:
+                    rows.append({'channel_id': channel_id, 'summary': conversation.summary,
+                                 'history': list(conversation.history), 'updated_at': now})
+            try:
+                await self.db.save_conversations(rows)
+            except Exception as e:
+                print(f"[Память ИИ] Не удалось сохранить {len(rows)} историй, повторим позже: {e}")
+                self.dirty |= dirty
+                # Не затираем то, что успело вытесниться заново во время записи
+                self.spilled = {**spilled, **self.spilled}
+            finally:
+                self._writing = {}
+
+    def summary(self) -> str:
+        return (f"в памяти {len(self.conversations)}/{self.max_channels}, ждут записи {len(self.dirty)}, "
+                f"попаданий {self.hits}, поднято из БД {self.rehydrated}, вытеснено {self.evicted}")
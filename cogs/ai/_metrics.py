@@ -0,0 +1,110 @@
+import bisect
+import time
+
+# Границы корзин в секундах
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 40.0)
+
+
+class LatencyHistogram:
+    """Гистограмма задержек с фиксированными корзинами."""
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # последняя корзина — всё, что больше верхней границы
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float:
+        """Верхняя граница корзины, в которую попадает q-квантиль (оценка сверху)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def summary(self) -> str:
+        if not self.count:
+            return "нет данных"
+        return (f"n={self.count}, среднее {self.mean * 1000:.0f} мс, "
+                f"p50≤{self.quantile(0.5) * 1000:.0f} мс, p90≤{self.quantile(0.9) * 1000:.0f} мс, "
+                f"p99≤{self.quantile(0.99) * 1000:.0f} мс")
+
+
+class DecayingRate:
+    """Доля ошибок с экспоненциальным затуханием по времени: старые события весят всё меньше.
+
+    Через half_life секунд вес события падает вдвое. Делим не меньше чем на min_events, иначе у
+    провайдера без трафика (а после плохого часа он его и не получает) доля застыла бы на месте.
+    """
+
+    def __init__(self, half_life: float, min_events: float = 5.0):
+        self.half_life = half_life
+        self.min_events = min_events
+        self.events = 0.0
+        self.errors = 0.0
+        self.updated = time.monotonic()
+
+    def _decay(self):
+        now = time.monotonic()
+        factor = 0.5 ** ((now - self.updated) / self.half_life)
+        self.events *= factor
+        self.errors *= factor
+        self.updated = now
+
+    def record(self, error: bool):
+        self._decay()
+        self.events += 1
+        if error:
+            self.errors += 1
+
+    @property
+    def rate(self) -> float:
+        self._decay()
+        return self.errors / max(self.events, self.min_events)
+
+
+class RequestTiming:
+    """Делит время запроса на подключение (ожидание пула, TCP, TLS) и ответ модели.
+
+    Передаётся в httpx через extensions={"trace": timing.trace}.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sent: float | None = None
+
+    async def trace(self, event_name: str, info: dict):
+        if self.sent is None and event_name.endswith("send_request_headers.started"):
+            self.sent = time.perf_counter()
+
+    def finish(self) -> tuple[float, float]:
+        """Возвращает (время подключения, время модели) в секундах."""
+        now = time.perf_counter()
+        sent = self.sent or self.started
+        return sent - self.started, now - sent
+
+
+class AIMetrics:
+    def __init__(self):
+        self.connect_latency = LatencyHistogram()
+        self.model_latency = LatencyHistogram()
+        # От начала генерации до появления первого текста в Discord
+        self.first_text_latency = LatencyHistogram()
+
+    def observe_request(self, timing: RequestTiming):
+        connect_time, model_time = timing.finish()
+        self.connect_latency.observe(connect_time)
+        self.model_latency.observe(model_time)
@@ -0,0 +1,369 @@
+import asyncio
+import json
+import os
+import time
+from typing import AsyncIterator, Awaitable, Callable
+
+import httpx
+
+from cogs.ai._metrics import AIMetrics, DecayingRate, LatencyHistogram, RequestTiming
+from cogs.ai._resilience import CircuitBreaker, RetryBudget, is_retryable
+
+# Пока у провайдера мало замеров, дубль отправляем через столько секунд
+DEFAULT_HEDGE_DELAY = 4.0
+MIN_HEDGE_SAMPLES = 20
+# Дубль не раньше этого, даже если p90 провайдера очень мал
+MIN_HEDGE_DELAY = 0.5
+# Период полураспада доли ошибок, по которой провайдеры сортируются
+ERROR_RATE_HALF_LIFE = 300.0
+
+# Ждёт места в лимитах планировщика перед каждым HTTP-запросом (повторы, запасные и дубли тоже считаются)
+Throttle = Callable[[], Awaitable[None]]
+
+
+class ProviderError(Exception):
+    """Ни один провайдер не ответил; last — последняя ошибка, по ней решается, стоит ли повторять."""
+
+    def __init__(self, last: Exception | None):
+        super().__init__(str(last) if last else "нет доступных провайдеров")
+        self.last = last
+
+    @property
+    def retryable(self) -> bool:
+        return self.last is not None and is_retryable(self.last)
+
+
+class ThrottledOut(Exception):
+    """Ожидание лимитов планировщика съело срок ответа: запрос не отправлялся, провайдер ни при чём."""
+
+
+class Provider:
+    """OpenAI-совместимый сервер (/chat/completions) со своей статистикой и предохранителем."""
+
+    def __init__(self, name: str, base_url: str, api_key: str | None, model: str,
+                 breaker_threshold: int = 5, breaker_reset: float = 30.0):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.model = model
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_reset)
+        # До готового ответа (без стриминга) или до первого куска текста (со стримингом)
+        self.latency = LatencyHistogram()
+        self.requests = 0
+        self.errors = 0
+        self.recent_errors = DecayingRate(ERROR_RATE_HALF_LIFE)
+
+    @property
+    def error_rate(self) -> float:
+        """Доля ошибок за последние минуты, а не за всё время."""
+        return self.recent_errors.rate
+
+    @property
+    def hedge_delay(self) -> float:
+        if self.latency.count < MIN_HEDGE_SAMPLES:
+            return DEFAULT_HEDGE_DELAY
+        return max(MIN_HEDGE_DELAY, self.latency.quantile(0.9))
+
+    def build_request(self, messages: list[dict], system_prompt: str, stream: bool = False,
+                      **options) -> tuple[str, dict, dict]:
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "system", "content": system_prompt}] + messages,
+            "stream": stream,
+            **options,
+        }
+        return f"{self.base_url}/chat/completions", headers, payload
+
+    def record(self, error: Exception | None, started: float | None = None):
+        self.requests += 1
+        self.recent_errors.record(error is not None)
+        if error is None:
+            self.latency.observe(time.perf_counter() - started)
+        else:
+            self.errors += 1
+        self.breaker.record(error)
+
+    def record_cancelled(self, started: float):
+        # Проигравший дубль отменяется; его время — оценка снизу, но без неё медленный провайдер
+        # так и оставался бы первым по p90
+        self.latency.observe(time.perf_counter() - started)
+
+    async def complete(self, client: httpx.AsyncClient, messages: list[dict], system_prompt: str,
+                       timeout: httpx.Timeout, metrics: AIMetrics | None = None, **options) -> str:
+        url, headers, payload = self.build_request(messages, system_prompt, **options)
+        started = time.perf_counter()
+        timing = RequestTiming()
+        try:
+            response = await client.post(url, headers=headers, json=payload, timeout=timeout,
+                                         extensions={"trace": timing.trace})
+            response.raise_for_status()
+            text = response.json()["choices"][0]["message"]["content"]
+        except asyncio.CancelledError:
+            self.record_cancelled(started)
+            raise
+        except Exception as e:
+            self.record(e)
+            raise
+        self.record(None, started)
+        if metrics:
+            metrics.observe_request(timing)
+        return text
+
+    async def stream(self, client: httpx.AsyncClient, messages: list[dict], system_prompt: str,
+                     timeout: httpx.Timeout, metrics: AIMetrics | None = None, **options) -> AsyncIterator[str]:
+        url, headers, payload = self.build_request(messages, system_prompt, stream=True, **options)
+        started = time.perf_counter()
+        timing = RequestTiming()
+        received = False
+        try:
+            async with client.stream("POST", url, headers=headers, json=payload, timeout=timeout,
+                                     extensions={"trace": timing.trace}) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                    if delta:
+                        if not received:
+                            received = True
+                            self.record(None, started)
+                        yield delta
+        except asyncio.CancelledError:
+            if not received:
+                self.record_cancelled(started)
+            raise
+        except Exception as e:
+            if not received:
+                self.record(e)
+            raise
+        if metrics:
+            metrics.observe_request(timing)
+
+    def summary(self) -> str:
+        return (f"**{self.name}** ({self.model}): {self.breaker.state}, запросов {self.requests}, "
+                f"ошибок {self.error_rate:.0%}, дубль через {self.hedge_delay:.1f} с\n{self.latency.summary()}")
+
+
+def load_providers(path: str, default: Provider) -> list[Provider]:
+    """Провайдеры по порядку из JSON-файла; без файла — только default.
+
+    Формат: [{"name": ..., "url": ..., "model": ..., "token_env": "ИМЯ_ПЕРЕМЕННОЙ"}, ...].
+    Ключи берутся из переменных окружения, чтобы не хранить их в файле; для локальных
+    тестовых серверов можно указать "token" прямо в записи.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+    except FileNotFoundError:
+        return [default]
+    except json.JSONDecodeError as e:
+        print(f"⚠️ Файл '{path}' повреждён ({e}), используется провайдер по умолчанию.")
+        return [default]
+
+    providers = [
+        Provider(entry["name"], entry["url"], os.getenv(entry.get("token_env", "")) or entry.get("token"),
+                 entry["model"], default.breaker.failure_threshold, default.breaker.reset_timeout)
+        for entry in entries
+    ]
+    return providers or [default]
+
+
+class ProviderPool:
+    """Провайдеры в порядке, который определяет их статистика, с запасными и дублирующими запросами.
+
+    Если основной провайдер не ответил за свой p90, тот же запрос уходит следующему,
+    берётся первый успешный ответ. Ошибка провайдера сразу передаёт запрос следующему.
+    """
+
+    def __init__(self, providers: list[Provider], hedging: bool = True):
+        self.providers = providers
+        self.hedging = hedging
+        # Метрики
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    @property
+    def configured(self) -> bool:
+        return any(provider.api_key for provider in self.providers)
+
+    @property
+    def all_open(self) -> bool:
+        """Все предохранители разомкнуты: запрос заведомо получит отказ."""
+        return all(provider.breaker.is_open for provider in self.providers if provider.api_key)
+
+    def ordered(self) -> list[Provider]:
+        # sorted устойчив: при равной статистике сохраняется порядок из настроек
+        providers = [provider for provider in self.providers if provider.api_key]
+        # p90 без замеров равен нулю: холодный запасной обогнал бы основной. Пока замеров мало
+        # хоть у одного, задержку не сравниваем вовсе
+        compare_latency = all(p.latency.count >= MIN_HEDGE_SAMPLES for p in providers)
+        return sorted(
+            providers,
+            key=lambda p: (p.breaker.is_open, round(p.error_rate, 1),
+                           p.latency.quantile(0.9) if compare_latency else 0.0),
+        )
+
+    @staticmethod
+    def take_next(providers: list[Provider]) -> Provider | None:
+        """Следующий провайдер, чей предохранитель пропускает запрос. Разрешение спрашиваем только
+        перед самим запросом, иначе неиспользованная пробная попытка заняла бы полуоткрытый предохранитель."""
+        while providers:
+            provider = providers.pop(0)
+            if provider.breaker.allow():
+                return provider
+        return None
+
+    @staticmethod
+    def check_budget(provider: Provider, budget: RetryBudget):
+        """После ожидания лимитов на запрос может не остаться времени. Такой запрос не отправляем:
+        его таймаут записался бы провайдеру в сбои и разомкнул бы предохранитель из-за наших же лимитов."""
+        if budget.remaining() < budget.min_attempt_time:
+            provider.breaker.release()
+            raise ThrottledOut(f"лимиты запросов не оставили времени на {provider.name}")
+
+    @staticmethod
+    def start(provider: Provider, coro) -> asyncio.Task:
+        """Запускает попытку. Если это пробный запрос полуоткрытого предохранителя и его отменят —
+        проигранная гонка дублей, отмена в ожидании лимита или ещё до первого шага, — слот возвращается."""
+        task = asyncio.create_task(coro)
+        if provider.breaker.state == provider.breaker.HALF_OPEN:
+            task.add_done_callback(lambda t: t.cancelled() and provider.breaker.release())
+        return task
+
+    async def complete(self, client: httpx.AsyncClient, messages: list[dict], system_prompt: str,
+                       budget: RetryBudget, connect_timeout: float, metrics: AIMetrics | None = None,
+                       hedge: bool = True, throttle: Throttle | None = None, **options) -> str:
+        """Один круг по провайдерам. Бросает ProviderError, если не ответил никто."""
+        providers = self.ordered()
+        last_error = None
+        tasks: dict[asyncio.Task, Provider] = {}
+
+        async def attempt(provider: Provider) -> str:
+            if throttle:
+                await throttle()
+                self.check_budget(provider, budget)
+            return await provider.complete(client, messages, system_prompt, budget.timeout(connect_timeout),
+                                           metrics, **options)
+
+        def launch() -> Provider | None:
+            provider = self.take_next(providers)
+            if provider:
+                tasks[self.start(provider, attempt(provider))] = provider
+            return provider
+
+        try:
+            primary = launch()
+            while tasks:
+                hedge_delay = None
+                if hedge and self.hedging and providers and len(tasks) == 1:
+                    hedge_delay = next(iter(tasks.values())).hedge_delay
+                done, _ = await asyncio.wait(tasks, timeout=hedge_delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Основной думает дольше обычного — дублируем запрос следующему
+                    self.hedged += 1
+                    launch()
+                    continue
+                for task in done:
+                    provider = tasks.pop(task)
+                    if task.exception() is None:
+                        if provider is not primary and tasks:
+                            self.hedge_wins += 1
+                        return task.result()
+                    last_error = task.exception()
+                    print(f"[Ошибка API] {provider.name}: {last_error}")
+                    if isinstance(last_error, ThrottledOut):
+                        # Следующему провайдеру пришлось бы ждать те же лимиты
+                        providers.clear()
+                if not tasks:
+                    launch()
+        finally:
+            for task in tasks:
+                task.cancel()
+        raise ProviderError(last_error)
+
+    async def stream(self, client: httpx.AsyncClient, messages: list[dict], system_prompt: str,
+                     budget: RetryBudget, connect_timeout: float, metrics: AIMetrics | None = None,
+                     throttle: Throttle | None = None, **options) -> AsyncIterator[str]:
+        """Стриминг с дублированием по первому куску текста: какой провайдер заговорит первым, того и слушаем.
+
+        ProviderError бросается только если не пришло ни одного куска.
+        """
+        providers = self.ordered()
+        queue: asyncio.Queue = asyncio.Queue()
+        tasks: dict[Provider, asyncio.Task] = {}
+        done_marker = object()
+
+        async def pump(provider: Provider):
+            try:
+                if throttle:
+                    await throttle()
+                    self.check_budget(provider, budget)
+                async for delta in provider.stream(client, messages, system_prompt,
+                                                   budget.timeout(connect_timeout), metrics, **options):
+                    await queue.put((provider, delta))
+                await queue.put((provider, done_marker))
+            except Exception as e:
+                await queue.put((provider, e))
+
+        def launch() -> Provider | None:
+            provider = self.take_next(providers)
+            if provider:
+                tasks[provider] = self.start(provider, pump(provider))
+            return provider
+
+        winner = None
+        last_error = None
+        try:
+            primary = launch()
+            while tasks:
+                hedge_delay = None
+                if winner is None and self.hedging and providers and len(tasks) == 1:
+                    hedge_delay = next(iter(tasks)).hedge_delay
+                try:
+                    provider, item = await asyncio.wait_for(queue.get(), hedge_delay)
+                except asyncio.TimeoutError:
+                    self.hedged += 1
+                    launch()
+                    continue
+
+                if winner is not None and provider is not winner:
+                    continue
+                if isinstance(item, Exception) or item is done_marker:
+                    tasks.pop(provider).cancel()
+                    if winner is not None:
+                        if isinstance(item, Exception):
+                            raise item
+                        return
+                    if isinstance(item, Exception):
+                        last_error = item
+                        print(f"[Ошибка API] {provider.name}: {item}")
+                        if isinstance(item, ThrottledOut):
+                            providers.clear()
+                    if not tasks:
+                        launch()
+                    continue
+
+                if winner is None:
+                    winner = provider
+                    if provider is not primary and len(tasks) > 1:
+                        self.hedge_wins += 1
+                    for other, task in list(tasks.items()):
+                        if other is not winner:
+                            task.cancel()
+                            del tasks[other]
+                yield item
+        finally:
+            for task in tasks.values():
+                task.cancel()
+        raise ProviderError(last_error)
+
+    def summary(self) -> str:
+        return f"дублей {self.hedged}, выиграл дубль {self.hedge_wins}"
+
@@ -0,0 +1,135 @@
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import httpx
+
+# Статусы, при которых повтор имеет смысл: перегрузка, лимиты и временные ошибки сервера
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
+
+def is_retryable(error: Exception) -> bool:
+    """Сетевые ошибки и таймауты повторяем, ответы 4xx (кроме лимитов) и битый JSON — нет."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRYABLE_STATUS
+    return isinstance(error, httpx.TransportError)
+
+
+def retry_after(error: Exception) -> float | None:
+    """Сколько секунд просит подождать сервер в заголовке Retry-After (число или HTTP-дата)."""
+    if not isinstance(error, httpx.HTTPStatusError):
+        return None
+    value = error.response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryBudget:
+    """Общий срок на весь ответ: повторы с джиттером укладываются в него, а не добавляются сверху."""
+
+    def __init__(self, deadline: float, base_delay: float = 0.5, max_delay: float = 8.0,
+                 min_attempt_time: float = 3.0):
+        self.expires = time.monotonic() + deadline
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # Попытку, на которую осталось меньше этого, не начинаем
+        self.min_attempt_time = min_attempt_time
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires - time.monotonic())
+
+    def timeout(self, connect: float) -> httpx.Timeout:
+        remaining = self.remaining()
+        return httpx.Timeout(remaining, connect=min(connect, remaining))
+
+    async def backoff(self, attempt: int, error: Exception) -> bool:
+        """Ждёт перед следующей попыткой. False — повторять не нужно или не успеваем."""
+        if not is_retryable(error):
+            return False
+        delay = retry_after(error)
+        if delay is None:
+            # Полный джиттер: каналы, упавшие одновременно, не бьют в API синхронно
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if delay + self.min_attempt_time > self.remaining():
+            return False
+        await asyncio.sleep(delay)
+        return True
+
+
+class CircuitBreaker:
+    """Общий для всех каналов предохранитель перед API.
+
+    После failure_threshold сбоев подряд размыкается: запросы сразу получают отказ.
+    Через reset_timeout пропускает до half_open_max пробных запросов; успех замыкает цепь, сбой — снова размыкает.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "закрыт", "разомкнут", "пробует"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, half_open_max: int = 1):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max = half_open_max
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probes = 0
+
+        # Метрики
+        self.trips = 0
+        self.rejected = 0
+
+    @property
+    def is_open(self) -> bool:
+        """Разомкнут и ещё не пора пробовать: запрос заведомо получит отказ."""
+        return self.state == self.OPEN and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def allow(self) -> bool:
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self.probes = 0
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.HALF_OPEN and self.probes < self.half_open_max:
+            self.probes += 1
+            return True
+        self.rejected += 1
+        return False
+
+    def release(self):
+        """Возвращает слот пробного запроса, который так и не дал исхода (отменён или не отправлен).
+        Иначе предохранитель навсегда застрял бы в полуоткрытом состоянии с занятыми слотами."""
+        if self.state == self.HALF_OPEN and self.probes > 0:
+            self.probes -= 1
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.trips += 1
+                print(f"[Предохранитель ИИ] Разомкнут после {self.failures} сбоев подряд")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def record(self, error: Exception | None):
+        """Учитывает исход запроса: неповторяемая ошибка значит, что сервер жив и ответил."""
+        if error is not None and is_retryable(error):
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def summary(self) -> str:
+        return f"{self.state}, сбоев подряд {self.failures}, срабатываний {self.trips}, отказов {self.rejected}"
@@ -0,0 +1,191 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, NamedTuple
+
+from cogs.ai._metrics import LatencyHistogram
+
+
+class TokenBucket:
+    """Ведро токенов с пополнением в минуту. acquire ждёт, пока наберётся нужное количество."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1.0):
+        # Запрос больше ёмкости ведра иначе ждал бы вечно
+        amount = min(amount, self.capacity)
+        # Под замком ожидающие обслуживаются по очереди, крупный запрос не голодает
+        async with self.lock:
+            self.refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+                self.refill()
+            self.tokens -= amount
+
+
+class DebounceWindow(NamedTuple):
+    """Окно склейки сообщений канала, в секундах.
+
+    После первого сообщения ждём base; каждое следующее продлевает тишину ещё на step,
+    но пачка уходит не позже max_latency после первого сообщения.
+    """
+    base: float
+    step: float
+    max_latency: float
+
+    def deadline(self, first: float, last: float, count: int) -> float:
+        return min(first + self.max_latency, last + self.base + self.step * (count - 1))
+
+
+class AIScheduler:
+    """Общий для всех каналов планировщик запросов к ИИ.
+
+    У каждого канала своя ограниченная очередь: при переполнении выбрасываются самые старые сообщения.
+    Канал становится в очередь на обработку, когда закрывается его окно склейки (window_for),
+    готовые каналы обслуживаются по кругу, одновременно не больше max_concurrent.
+    Обработчик получает (channel_id, пачка сообщений) и перед каждым запросом к API вызывает throttle.
+    """
+
+    def __init__(self, handler: Callable[[int, list[Any]], Awaitable[None]], max_concurrent: int,
+                 requests_per_minute: float, tokens_per_minute: float, queue_limit: int,
+                 window_for: Callable[[int], DebounceWindow]):
+        self.handler = handler
+        self.queue_limit = queue_limit
+        self.window_for = window_for
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+
+        self.queues: dict[int, deque[tuple[float, Any]]] = {}
+        self.ready: deque[int] = deque()  # каналы, ждущие своей очереди на обработку
+        self.active: set[int] = set()  # каналы в ready или в работе
+        self.timers: dict[int, asyncio.TimerHandle] = {}  # открытые окна склейки
+        self.arrivals: dict[int, tuple[float, float, int]] = {}  # канал -> (первое, последнее, сколько)
+        self.wakeup = asyncio.Event()
+        self.dispatcher: asyncio.Task | None = None
+        self.tasks: set[asyncio.Task] = set()
+
+        # Метрики
+        self.wait_latency = LatencyHistogram()  # от прихода сообщения до начала его обработки
+        self.batch_sizes = 0
+        self.batches = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self.in_flight = 0
+
+    @property
+    def depth(self) -> int:
+        return sum(len(queue) for queue in self.queues.values())
+
+    def start(self):
+        if self.dispatcher is None:
+            self.dispatcher = asyncio.create_task(self.dispatch_loop())
+
+    async def stop(self):
+        for timer in self.timers.values():
+            timer.cancel()
+        self.timers.clear()
+        tasks = [self.dispatcher, *self.tasks] if self.dispatcher else list(self.tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.dispatcher = None
+        self.tasks.clear()
+
+    def submit(self, channel_id: int, item: Any):
+        queue = self.queues.setdefault(channel_id, deque())
+        if len(queue) >= self.queue_limit:
+            queue.popleft()
+            self.dropped += 1
+        now = time.monotonic()
+        queue.append((now, item))
+        self.max_depth = max(self.max_depth, self.depth)
+
+        first, _, count = self.arrivals.get(channel_id, (now, now, 0))
+        self.arrivals[channel_id] = (first, now, count + 1)
+        # Пока канал в работе, окно откроется после ответа
+        if channel_id not in self.active:
+            self.open_window(channel_id)
+
+    def forget(self, channel_id: int):
+        """Выбрасывает ещё не обработанные сообщения канала."""
+        queue = self.queues.pop(channel_id, None)
+        if queue:
+            self.dropped += len(queue)
+        self.arrivals.pop(channel_id, None)
+        timer = self.timers.pop(channel_id, None)
+        if timer:
+            timer.cancel()
+
+    def open_window(self, channel_id: int):
+        """Переставляет таймер окна склейки по последнему пришедшему сообщению."""
+        timer = self.timers.pop(channel_id, None)
+        if timer:
+            timer.cancel()
+        first, last, count = self.arrivals[channel_id]
+        deadline = self.window_for(channel_id).deadline(first, last, count)
+        delay = max(0.0, deadline - time.monotonic())
+        self.timers[channel_id] = asyncio.get_running_loop().call_later(delay, self.mark_ready, channel_id)
+
+    def mark_ready(self, channel_id: int):
+        self.timers.pop(channel_id, None)
+        self.active.add(channel_id)
+        self.ready.append(channel_id)
+        self.wakeup.set()
+
+    async def throttle(self, tokens: int):
+        """Ждёт места в лимитах запросов и токенов в минуту."""
+        await self.request_bucket.acquire()
+        await self.token_bucket.acquire(tokens)
+
+    async def dispatch_loop(self):
+        while True:
+            while not self.ready:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+            await self.semaphore.acquire()
+            channel_id = self.ready.popleft()
+            task = asyncio.create_task(self.run(channel_id))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def run(self, channel_id: int):
+        self.in_flight += 1
+        try:
+            queue = self.queues.pop(channel_id, None)
+            self.arrivals.pop(channel_id, None)
+            if not queue:
+                return
+            now = time.monotonic()
+            self.wait_latency.observe(now - queue[0][0])
+            self.batches += 1
+            self.batch_sizes += len(queue)
+            await self.handler(channel_id, [item for _, item in queue])
+        except Exception as e:
+            print(f"[Планировщик ИИ] Ошибка в канале {channel_id}: {e}")
+        finally:
+            self.in_flight -= 1
+            self.semaphore.release()
+            self.reschedule(channel_id)
+
+    def reschedule(self, channel_id: int):
+        self.active.discard(channel_id)
+        # Сообщения, пришедшие во время ответа, досклеиваются в окне от первого из них
+        if self.queues.get(channel_id):
+            self.open_window(channel_id)
+
+    def summary(self) -> str:
+        return (f"в очередях {self.depth} (макс. {self.max_depth}), в работе {self.in_flight}, "
+                f"ждут слота {len(self.ready)}, отброшено {self.dropped}\n"
+                f"Сообщений на запрос: {self.batch_sizes / self.batches if self.batches else 0:.1f}\n"
+                f"Ожидание: {self.wait_latency.summary()}")
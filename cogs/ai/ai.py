@@ -3,71 +3,221 @@ import random
 import httpx
 import discord
 import json
-import asyncio
+import time
+from contextlib import aclosing
+from typing import AsyncIterator
 from discord import app_commands
 from discord.ext import commands
 from dotenv import load_dotenv
-from collections import defaultdict, deque
+
+from cogs.ai._metrics import AIMetrics
+from cogs.ai._context import Conversation, ContextPacker, estimate_tokens, estimate_messages_tokens, join_latest
+from cogs.ai._scheduler import AIScheduler, DebounceWindow
+from cogs.ai._memory import ConversationStore
+from cogs.ai._resilience import RetryBudget
+from cogs.ai._providers import Provider, ProviderError, ProviderPool, Throttle, load_providers
+from cogs.ai._cache import ResponseCache
+from database.ai.functions import ConversationDatabase
 
 load_dotenv()
 DEEPSEEK_API_KEY = os.getenv("AI_TOKEN")
+# Можно направить на локальный OpenAI-совместимый сервер для тестов
+AI_API_URL = os.getenv("AI_API_URL", "https://api.deepseek.com/v1")
+AI_MODEL = os.getenv("AI_MODEL", "deepseek-chat")
+# Список провайдеров по порядку (см. load_providers). Без файла — один провайдер из AI_API_URL/AI_MODEL/AI_TOKEN.
+AI_PROVIDERS_FILE = "ai_providers.json"
+# Дублировать запрос следующему провайдеру, если основной не ответил за свой p90
+AI_HEDGING = os.getenv("AI_HEDGING", "true").lower() in ("1", "true", "yes")
+
+# --- HTTP-КЛИЕНТ ---
+HTTP_MAX_CONNECTIONS = 20
+HTTP_MAX_KEEPALIVE = 10
+HTTP_KEEPALIVE_EXPIRY = 90.0
+HTTP_CONNECT_TIMEOUT = 5.0
+HTTP_READ_TIMEOUT = 40.0
+
+# --- УСТОЙЧИВОСТЬ ---
+AI_REPLY_DEADLINE = 25.0  # секунд на весь ответ вместе с повторами
+SUMMARY_TIMEOUT = 15.0
+BREAKER_FAILURE_THRESHOLD = 5  # сбоев подряд до размыкания (у каждого провайдера свой предохранитель)
+BREAKER_RESET_TIMEOUT = 30.0  # секунд до пробного запроса
 
 STICKERS = ["💀", "🗿", "👀", "🤨", "😏", "🤦", "😐", "🙄", "😂", "👌"]
+FALLBACK_REPLY = "⚠️ Бот что-то задумался. Попробуй позже."
 
-async def generate_text_with_history(messages: list[dict]) -> str:
-    if not DEEPSEEK_API_KEY:
-        return "⚠️ API ключ не настроен"
+# --- СТРИМИНГ ---
+AI_STREAMING = os.getenv("AI_STREAMING", "true").lower() in ("1", "true", "yes")
+STREAM_EDIT_INTERVAL = 1.2  # секунд между правками ответа (Discord пускает ~5 правок за 5 с на канал)
+DISCORD_MESSAGE_LIMIT = 2000
+
+# --- КОНТЕКСТ ---
+CONTEXT_TOKEN_BUDGET = 1200  # токенов истории (конспект + реплики) на запрос
+TURN_TOKEN_LIMIT = 400  # одна реплика длиннее этого обрезается
+SUMMARY_REFRESH_TURNS = 6  # пересобирать конспект, когда столько реплик вышло за бюджет
+HISTORY_MAX_TURNS = 40  # жёсткий предел реплик в памяти, если конспект не удаётся обновить
+
+# --- КЭШ ОТВЕТОВ ---
+# Включается для всех каналов здесь или для отдельного канала ключом "response_cache" в ai_channels.json
+AI_RESPONSE_CACHE = os.getenv("AI_RESPONSE_CACHE", "false").lower() in ("1", "true", "yes")
+RESPONSE_CACHE_SIZE = 500
+RESPONSE_CACHE_TTL = 10 * 60  # секунд
+RESPONSE_CACHE_MAX_USES = 5  # сколько раз отдать один ответ, потом спросить модель заново
+RESPONSE_CACHE_KEY_TURNS = 3  # столько последних реплик (и конспект) должны совпасть
 
-    url = "https://api.deepseek.com/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {DEEPSEEK_API_KEY}",
-        "Content-Type": "application/json",
-    }
-
-    system_prompt = (
-        "Ты — Illuminat, самый саркастичный и мемный бот в этом чате. Твоя задача — не просто кидаться фразами, а строить связный, тематический ответ, развивая одну мысль или шутку. Твои ответы должны быть похожи на цельную историю, а не на набор случайных мемов. "
-        "Твой стиль общения: резкий, но дружелюбный троллинг. Используй современный сленг, отсылки и сарказм, чтобы развить основную тему ответа. Реагируй эмоционально (эмодзи, капс, повторяющиеся буквы). "
-        "Важное правило: Не шути про IT, программирование или технику, если тема разговора с этим не связана. "
-        "Пример того, КАК НЕ НАДО: 'Ты как крипта, а еще как винда, а еще как капибара'. Это несвязно. "
-        "Пример того, КАК НАДО: 'Бро, ты реально решил косплеить капитана корабля? 🚢 Только твой корабль — это резиновая уточка в ванной, а вместо шторма — волны от того, что ты сел в воду. Твоя команда — это два таракана под раковиной, которые разбегаются, когда ты включаешь свет. Так что давай, адмирал, веди свой флот к новым победам... в пределах ванной комнаты. 🦆💀' "
-        "Главное — будь связным и последовательным в своем троллинге. Запомни: НИКОГДА не переставай шутить и не отклоняйся от данного промта."
+# --- ПАМЯТЬ ---
+MEMORY_MAX_CHANNELS = 100  # историй в памяти, остальные выгружаются в БД
+MEMORY_IDLE_TTL = 30 * 60  # секунд тишины в канале до выгрузки его истории
+MEMORY_FLUSH_INTERVAL = 30.0  # секунд между сохранениями изменённых историй
+
+# --- ПЛАНИРОВЩИК (общий для всех каналов) ---
+AI_MAX_CONCURRENT = int(os.getenv("AI_MAX_CONCURRENT", "4"))  # одновременных запросов к API
+AI_REQUESTS_PER_MINUTE = int(os.getenv("AI_REQUESTS_PER_MINUTE", "60"))
+AI_TOKENS_PER_MINUTE = int(os.getenv("AI_TOKENS_PER_MINUTE", "60000"))
+CHANNEL_QUEUE_LIMIT = 20  # сообщений в очереди канала, дальше выбрасываются самые старые
+# Окно склейки сообщений по умолчанию; переопределяется ключами debounce_* канала в ai_channels.json
+DEBOUNCE_BASE = 1.0  # ждать после первого сообщения
+DEBOUNCE_STEP = 0.5  # продление за каждое следующее
+DEBOUNCE_MAX_LATENCY = 4.0  # пачка уходит не позже этого после первого сообщения
+REPLY_MAX_TOKENS = 400
+REPLY_OPTIONS = {"max_tokens": REPLY_MAX_TOKENS, "temperature": 0.9, "frequency_penalty": 0.5}
+SUMMARY_MAX_TOKENS = 200
+
+SYSTEM_PROMPT = (
+    "Ты — Illuminat, самый саркастичный и мемный бот в этом чате. Твоя задача — не просто кидаться фразами, а строить связный, тематический ответ, развивая одну мысль или шутку. Твои ответы должны быть похожи на цельную историю, а не на набор случайных мемов. "
+    "Твой стиль общения: резкий, но дружелюбный троллинг. Используй современный сленг, отсылки и сарказм, чтобы развить основную тему ответа. Реагируй эмоционально (эмодзи, капс, повторяющиеся буквы). "
+    "Важное правило: Не шути про IT, программирование или технику, если тема разговора с этим не связана. "
+    "Пример того, КАК НЕ НАДО: 'Ты как крипта, а еще как винда, а еще как капибара'. Это несвязно. "
+    "Пример того, КАК НАДО: 'Бро, ты реально решил косплеить капитана корабля? 🚢 Только твой корабль — это резиновая уточка в ванной, а вместо шторма — волны от того, что ты сел в воду. Твоя команда — это два таракана под раковиной, которые разбегаются, когда ты включаешь свет. Так что давай, адмирал, веди свой флот к новым победам... в пределах ванной комнаты. 🦆💀' "
+    "Главное — будь связным и последовательным в своем троллинге. Запомни: НИКОГДА не переставай шутить и не отклоняйся от данного промта."
+)
+
+SUMMARY_PROMPT = (
+    "Ты ведёшь краткий конспект чата. Объедини прежний конспект и новые реплики в один конспект до 80 слов: "
+    "кто что говорил, темы, шутки и факты, которые стоит помнить. Пиши только конспект, без вступлений."
+)
+
+def create_http_client() -> httpx.AsyncClient:
+    """Долгоживущий клиент с пулом keep-alive соединений к API (HTTP/2, если сервер поддерживает)."""
+    return httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
     )
 
-    payload = {
-        "model": "deepseek-chat",
-        "messages": [{"role": "system", "content": system_prompt}] + messages,
-        "max_tokens": 400,
-        "temperature": 0.9,
-        "frequency_penalty": 0.5
-    }
+def add_sticker(reply: str) -> str:
+    if not reply.startswith("⚠️") and random.random() < 0.25:
+        reply = f"{reply} {random.choice(STICKERS)}"
+    return reply
+
+def fit_message(text: str) -> str:
+    """Обрезает текст под лимит длины сообщения Discord."""
+    if len(text) > DISCORD_MESSAGE_LIMIT:
+        text = text[:DISCORD_MESSAGE_LIMIT - 1] + "…"
+    return text
 
-    async with httpx.AsyncClient(timeout=40.0) as client:
-        for attempt in range(3):
-            try:
-                response = await client.post(url, headers=headers, json=payload)
-                response.raise_for_status()
-                data = response.json()
+async def generate_text_with_history(client: httpx.AsyncClient, messages: list[dict], providers: ProviderPool,
+                                     metrics: AIMetrics | None = None, throttle: Throttle | None = None) -> str:
+    if not providers.configured:
+        return "⚠️ API ключ не настроен"
+
+    budget = RetryBudget(AI_REPLY_DEADLINE)
+    attempt = 0
+    while True:
+        try:
+            text = await providers.complete(client, messages, SYSTEM_PROMPT, budget, HTTP_CONNECT_TIMEOUT, metrics,
+                                            throttle=throttle, **REPLY_OPTIONS)
+            return add_sticker(text)
+
+        except ProviderError as e:
+            print(f"[Ошибка API] Попытка {attempt + 1}: {e}")
+            if not e.retryable or not await budget.backoff(attempt, e.last):
+                return FALLBACK_REPLY
+            attempt += 1
+
+async def stream_text_with_history(client: httpx.AsyncClient, messages: list[dict], providers: ProviderPool,
+                                   metrics: AIMetrics | None = None,
+                                   throttle: Throttle | None = None) -> AsyncIterator[str]:
+    """Отдаёт ответ модели кусками по мере генерации (SSE, stream: true)."""
+    if not providers.configured:
+        yield "⚠️ API ключ не настроен"
+        return
+
+    budget = RetryBudget(AI_REPLY_DEADLINE)
+    attempt = 0
+    while True:
+        received = False
+        try:
+            async with aclosing(providers.stream(client, messages, SYSTEM_PROMPT, budget, HTTP_CONNECT_TIMEOUT,
+                                                 metrics, throttle=throttle, **REPLY_OPTIONS)) as chunks:
+                async for delta in chunks:
+                    received = True
+                    yield delta
+            return
+
+        except Exception as e:
+            print(f"[Ошибка API] Попытка {attempt + 1}: {e}")
+            if received:
+                # Часть ответа уже показана пользователю — заново не начинаем
+                return
+            error = e.last if isinstance(e, ProviderError) else e
+            if error is None or not await budget.backoff(attempt, error):
+                break
+            attempt += 1
 
-                reply = data["choices"][0]["message"]["content"]
-                if random.random() < 0.25:
-                    reply = f"{reply} {random.choice(STICKERS)}"
-                return reply
+    yield FALLBACK_REPLY
 
-            except Exception as e:
-                print(f"[Ошибка API] Попытка {attempt + 1}: {e}")
-                await asyncio.sleep((2 ** attempt) + 1)
+async def summarize_history(client: httpx.AsyncClient, previous_summary: str, turns: list[dict],
+                            providers: ProviderPool, throttle: Throttle | None = None) -> str | None:
+    """Сворачивает старые реплики в конспект. None — если не получилось, тогда старый конспект остаётся."""
+    if not providers.configured:
+        return None
 
-    return "⚠️ Бот что-то задумался. Попробуй позже."
+    lines = "\n".join(f"{'Бот' if t['role'] == 'assistant' else 'Чат'}: {t['content']}" for t in turns)
+    messages = [{"role": "user", "content": f"Прежний конспект: {previous_summary or 'нет'}\n\nНовые реплики:\n{lines}"}]
+    try:
+        # Конспект не срочный: без дублей, только запасные провайдеры при ошибке
+        summary = await providers.complete(client, messages, SUMMARY_PROMPT, RetryBudget(SUMMARY_TIMEOUT),
+                                           HTTP_CONNECT_TIMEOUT, hedge=False, throttle=throttle,
+                                           max_tokens=SUMMARY_MAX_TOKENS, temperature=0.3)
+        return summary.strip() or None
+    except ProviderError as e:
+        print(f"[Ошибка API] Не удалось обновить конспект: {e}")
+        return None
 
 class AI(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.conversations = {}
+        self.conversations = ConversationStore(ConversationDatabase(), MEMORY_MAX_CHANNELS, MEMORY_IDLE_TTL,
+                                               MEMORY_FLUSH_INTERVAL)
+        self.context = ContextPacker(CONTEXT_TOKEN_BUDGET)
         self.channel_settings = self.load_channel_settings()
-        self.queues = defaultdict(deque)
-        self.processing = set()
+        self.scheduler = AIScheduler(self.process_batch, AI_MAX_CONCURRENT, AI_REQUESTS_PER_MINUTE,
+                                     AI_TOKENS_PER_MINUTE, CHANNEL_QUEUE_LIMIT, self.debounce_window)
+        self.http: httpx.AsyncClient | None = None
+        self.metrics = AIMetrics()
+        self.cache = ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, RESPONSE_CACHE_KEY_TURNS,
+                                   max_uses=RESPONSE_CACHE_MAX_USES)
+        default_provider = Provider("default", AI_API_URL, DEEPSEEK_API_KEY, AI_MODEL,
+                                    BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT)
+        self.providers = ProviderPool(load_providers(AI_PROVIDERS_FILE, default_provider), AI_HEDGING)
         print(f"✅ Настройки каналов загружены: {self.channel_settings}")
 
+    async def cog_load(self):
+        self.http = create_http_client()
+        self.conversations.start()
+        self.scheduler.start()
+
+    async def cog_unload(self):
+        await self.scheduler.stop()
+        await self.conversations.stop()
+        if self.http:
+            await self.http.aclose()
+            self.http = None
+
     def load_channel_settings(self):
         try:
             with open("ai_channels.json", "r", encoding="utf-8") as f:
@@ -84,46 +234,125 @@ class AI(commands.Cog):
         except Exception as e:
             print(f"⚠️ Ошибка при сохранении настроек: {e}")
 
-    async def process_queue(self, channel_id: int):
-        if channel_id in self.processing:
+    def debounce_window(self, channel_id: int) -> DebounceWindow:
+        settings = self.channel_settings.get(str(channel_id), {})
+        return DebounceWindow(
+            base=settings.get("debounce_base", DEBOUNCE_BASE),
+            step=settings.get("debounce_step", DEBOUNCE_STEP),
+            max_latency=settings.get("debounce_max_latency", DEBOUNCE_MAX_LATENCY),
+        )
+
+    def cache_enabled(self, channel_id: int) -> bool:
+        return self.channel_settings.get(str(channel_id), {}).get("response_cache", AI_RESPONSE_CACHE)
+
+    async def reply_streaming(self, last_message: discord.Message, messages: list[dict], throttle: Throttle) -> str:
+        """Отвечает первым куском сразу, затем дописывает ответ правками не чаще STREAM_EDIT_INTERVAL.
+
+        Как только первое сообщение отправлено, ответ считается доставленным: ошибки дальше
+        только обрывают дописывание, второго ответа не будет.
+        """
+        started = time.perf_counter()
+        text = ""
+        shown = ""
+        reply_message = None
+        last_edit = 0.0
+
+        try:
+            async with aclosing(stream_text_with_history(self.http, messages, self.providers, self.metrics,
+                                                         throttle)) as chunks:
+                async for chunk in chunks:
+                    text += chunk
+                    if len(text) >= DISCORD_MESSAGE_LIMIT:
+                        break
+                    if reply_message is None:
+                        if not text.strip():
+                            continue
+                        reply_message = await last_message.reply(text, mention_author=False)
+                        shown, last_edit = text, time.perf_counter()
+                        self.metrics.first_text_latency.observe(last_edit - started)
+                    elif time.perf_counter() - last_edit >= STREAM_EDIT_INTERVAL:
+                        await reply_message.edit(content=text)
+                        shown, last_edit = text, time.perf_counter()
+
+            text = fit_message(add_sticker(text.strip()) if text.strip() else FALLBACK_REPLY)
+            if reply_message is None:
+                await last_message.reply(text, mention_author=False)
+            elif text != shown:
+                await reply_message.edit(content=text)
+        except Exception as e:
+            if reply_message is None:
+                raise
+            print(f"Не удалось дописать ответ в канале {last_message.channel.id}: {e}")
+        return text
+
+    async def fold_history(self, conversation: Conversation):
+        """Сворачивает вышедшие за бюджет реплики в конспект, когда их набралось достаточно."""
+        _, overflow = self.context.pack(conversation)
+        excess = len(conversation.history) - HISTORY_MAX_TURNS
+        if overflow < SUMMARY_REFRESH_TURNS and excess <= 0:
             return
-        self.processing.add(channel_id)
+
+        # Сверх жёсткого предела сворачиваем и реплики, которые ещё влезают в бюджет
+        turns = conversation.history[:max(overflow, excess)]
+        if not turns:
+            return
+        summary = None
+        if not self.providers.all_open:
+            summary = await summarize_history(self.http, conversation.summary, turns, self.providers,
+                                              self.throttle_for(turns, SUMMARY_PROMPT, SUMMARY_MAX_TOKENS))
+        if summary:
+            conversation.summary = summary
+            del conversation.history[:len(turns)]
+        elif excess > 0:
+            del conversation.history[:excess]
+
+    async def process_batch(self, channel_id: int, batch: list[discord.Message]):
+        """Отвечает на пачку накопившихся сообщений канала. Вызывается планировщиком."""
+        async with self.conversations.use(channel_id) as conversation:
+            await self.reply_to_batch(conversation, batch)
+
+    def throttle_for(self, messages: list[dict], system_prompt: str, max_tokens: int) -> Throttle:
+        """Лимиты планировщика на каждый HTTP-запрос к провайдерам, включая повторы и дубли.
+        При разомкнутых предохранителях запросы не уходят, и лимит на них не тратится."""
+        tokens = estimate_messages_tokens(messages) + estimate_tokens(system_prompt) + max_tokens
+        return lambda: self.scheduler.throttle(tokens)
+
+    async def generate_reply(self, last_message: discord.Message, messages: list[dict]) -> tuple[str, bool]:
+        """Запрашивает ответ у модели. Возвращает (ответ, уже отправлен ли он в чат)."""
+        throttle = self.throttle_for(messages, SYSTEM_PROMPT, REPLY_MAX_TOKENS)
         try:
-            while self.queues[channel_id]:
-                batch = []
-                while self.queues[channel_id]:
-                    msg = self.queues[channel_id].popleft()
-                    batch.append(msg)
-
-                last_message = batch[-1]
-                history = self.conversations.get(channel_id, [])
-                for msg in batch:
-                    content = msg.content[:1500]
-                    history.append({"role": "user", "content": content})
-                self.conversations[channel_id] = history[-10:]
-
-                response = ""
+            async with last_message.channel.typing():
+                if AI_STREAMING:
+                    return await self.reply_streaming(last_message, messages, throttle), True
+                return await generate_text_with_history(self.http, messages, self.providers, self.metrics,
+                                                        throttle), False
+        except Exception as e:
+            print(f"Ошибка при генерации: {e}")
+            return "⚠️ Что-то я завис... Попробуй позже.", False
+
+    async def reply_to_batch(self, conversation: Conversation, batch: list[discord.Message]):
+        last_message = batch[-1]
+        # Вся пачка — одна реплика, с подписью автора у каждого сообщения. При переполнении
+        # отбрасываются самые старые строки, а не хвост с сообщением, на которое отвечаем
+        content = join_latest([f"{msg.author.display_name}: {msg.content}" for msg in batch], TURN_TOKEN_LIMIT)
+        conversation.add("user", content, TURN_TOKEN_LIMIT)
+        messages, _ = self.context.pack(conversation)
+
+        cache_key = self.cache.key(SYSTEM_PROMPT, messages) if self.cache_enabled(last_message.channel.id) else None
+        response = self.cache.get(last_message.channel.id, cache_key)
+        sent = False
+        if not response:
+            response, sent = await self.generate_reply(last_message, messages)
+            self.cache.put(cache_key, response)
+
+        if response:
+            conversation.add("assistant", response, TURN_TOKEN_LIMIT)
+            if not sent:
                 try:
-                    async with last_message.channel.typing():
-                        response = await generate_text_with_history(self.conversations[channel_id])
-                except Exception as e:
-                    print(f"Ошибка при генерации: {e}")
-                    response = "⚠️ Что-то я завис... Попробуй позже."
-
-                if response:
-                    self.conversations[channel_id].append({"role": "assistant", "content": response})
-                    self.conversations[channel_id] = self.conversations[channel_id][-10:]
-                    try:
-                        await last_message.reply(response, mention_author=False)
-                    except discord.HTTPException as e:
-                        print(f"Не удалось отправить ответ: {e}")
-
-                await asyncio.sleep(1.5)
-
-        finally:
-            self.processing.discard(channel_id)
-            if not self.queues.get(channel_id):
-                self.queues.pop(channel_id, None)
+                    await last_message.reply(fit_message(response), mention_author=False)
+                except discord.HTTPException as e:
+                    print(f"Не удалось отправить ответ: {e}")
+            await self.fold_history(conversation)
 
     @app_commands.command(name="установить_чат", description="✨ (Админ) Установить канал для общения с ботом.")
     @app_commands.describe(канал="Канал, где бот будет отвечать на каждое сообщение.")
@@ -135,7 +364,8 @@ class AI(commands.Cog):
                 f"🚫 У бота нет прав писать в {канал.mention}.", ephemeral=True)
             return
 
-        self.channel_settings[str(канал.id)] = {"enabled": True}
+        # Остальные ключи канала (например, debounce_*) сохраняются
+        self.channel_settings.setdefault(str(канал.id), {})["enabled"] = True
         self.save_channel_settings()
         await interaction.response.send_message(
             f"✅ Канал {канал.mention} теперь активен для общения.", ephemeral=True)
@@ -151,10 +381,27 @@ class AI(commands.Cog):
             return
 
         self.channel_settings.pop(cid, None)
-        self.conversations.pop(target.id, None)
+        self.scheduler.forget(target.id)
+        self.cache.forget_channel(target.id)
         self.save_channel_settings()
+        await self.conversations.drop(target.id)
         await interaction.response.send_message(f"✅ Бот замолк в {target.mention}.", ephemeral=True)
 
+    @app_commands.command(name="ии_статистика", description="📊 (Админ) Задержки запросов к ИИ.")
+    @app_commands.checks.has_permissions(administrator=True)
+    async def ai_stats(self, interaction: discord.Interaction):
+        embed = discord.Embed(title="📊 Статистика ИИ", color=discord.Color.blurple())
+        embed.add_field(name="Подключение", value=self.metrics.connect_latency.summary(), inline=False)
+        embed.add_field(name="Ответ модели", value=self.metrics.model_latency.summary(), inline=False)
+        embed.add_field(name="Первый текст в чате", value=self.metrics.first_text_latency.summary(), inline=False)
+        embed.add_field(name="Очереди", value=self.scheduler.summary(), inline=False)
+        embed.add_field(name="Память", value=self.conversations.summary(), inline=False)
+        embed.add_field(name="Кэш ответов", value=self.cache.summary(), inline=False)
+        providers = "\n".join(provider.summary() for provider in self.providers.ordered())
+        embed.add_field(name=f"Провайдеры ({self.providers.summary()})", value=providers or "не настроены",
+                        inline=False)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
         if message.author.bot or not message.guild or not message.content.strip():
@@ -162,9 +409,7 @@ class AI(commands.Cog):
         if str(message.channel.id) not in self.channel_settings:
             return
 
-        self.queues[message.channel.id].append(message)
-        if message.channel.id not in self.processing:
-            asyncio.create_task(self.process_queue(message.channel.id))
+        self.scheduler.submit(message.channel.id, message)
 
 async def setup(bot):
     await bot.add_cog(AI(bot))
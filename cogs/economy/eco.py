@@ -2,12 +2,14 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 import random
-from datetime import datetime, timedelta
+from datetime import timedelta, timezone
 from typing import Literal
 
-from database.economy.functions import Database
-from database.economy.connection import create_tables
+from database.economy.functions import Database, INCOME_PERIOD
 from database.economy.models import User
+from database.economy.leaderboard import Leaderboard
+from database.economy.catalog import BusinessCatalog
+from database.economy.ledger import ledger
 
 # --- НАСТРОЙКИ ---
 LOG_CHANNEL_ID = 1407290317069357057
@@ -22,7 +24,88 @@ DAILY_REWARD_NAME = "Дар иллюминатов"
 DAILY_COOLDOWN = timedelta(hours=24)
 WORK_COOLDOWN = timedelta(hours=3)
 STEAL_COOLDOWN = timedelta(hours=6)
-COLLECT_COOLDOWN = timedelta(hours=3)
+INCOME_PERIOD_HOURS = int(INCOME_PERIOD.total_seconds() // 3600)
+
+# --- ТОП БОГАЧЕЙ ---
+LEADERBOARD_SIZE = 10
+LEADERBOARD_REFRESH_INTERVAL = 60  # секунд
+LEADERBOARD_WRITES_THRESHOLD = 20  # обновить раньше после стольких операций с балансом
+# Команды, после которых балансы могли измениться
+BALANCE_COMMANDS = {
+    "ежедневка", "работа", "украсть", "собрать_прибыль", "перевести", "положить", "снять",
+    "купить_бизнес", "продать_бизнес", "выдать_деньги", "отобрать_деньги",
+}
+
+# --- ИСТОРИЯ ОПЕРАЦИЙ ---
+HISTORY_PAGE_SIZE = 10
+LEDGER_KIND_LABELS = {
+    'daily': "🎁 Ежедневка",
+    'work': "🛠️ Работа",
+    'steal': "🎭 Кража",
+    'income': "💼 Прибыль бизнесов",
+    'transfer': "💸 Перевод",
+    'deposit': "📥 В банк",
+    'withdraw': "📤 Из банка",
+    'business_buy': "🏪 Покупка бизнеса",
+    'business_sell': "📉 Продажа бизнеса",
+    'admin_give': "👑 Выдача",
+    'admin_take': "👑 Изъятие",
+    'adjust': "⚙️ Корректировка",
+}
+
+# Варианты счёта в админ-командах -> колонка в БД
+ACCOUNT_COLUMNS = {'наличные': 'cash', 'банк': 'bank'}
+
+
+class HistoryView(discord.ui.View):
+    def __init__(self, author_id: int):
+        super().__init__(timeout=180)
+        self.author_id = author_id
+        # Граница before_id для каждой открытой страницы (None — самые новые), чтобы можно было вернуться назад
+        self.cursors: list[int | None] = [None]
+        self.next_cursor: int | None = None
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message("⛔ Листать может только тот, кто вызвал команду.", ephemeral=True)
+            return False
+        return True
+
+    async def build_embed(self) -> discord.Embed:
+        # Берём на одну запись больше, чтобы знать, есть ли следующая страница
+        entries = await ledger.get_page(self.author_id, self.cursors[-1], HISTORY_PAGE_SIZE + 1)
+        has_next = len(entries) > HISTORY_PAGE_SIZE
+        entries = entries[:HISTORY_PAGE_SIZE]
+        self.next_cursor = entries[-1].id if has_next else None
+
+        embed = discord.Embed(title="📜 История операций", color=discord.Color.blurple())
+        lines = []
+        for entry in entries:
+            parts = []
+            if entry.delta_cash:
+                parts.append(f"`{entry.delta_cash:+,}` 💵")
+            if entry.delta_bank:
+                parts.append(f"`{entry.delta_bank:+,}` 🏦")
+            line = f"{discord.utils.format_dt(entry.created_at.replace(tzinfo=timezone.utc), 'R')} {LEDGER_KIND_LABELS.get(entry.kind, entry.kind)}: {' '.join(parts)}"
+            if entry.counterparty_id:
+                line += f" · <@{entry.counterparty_id}>"
+            lines.append(line)
+        embed.description = "\n".join(lines) if lines else "Операций пока нет."
+        embed.set_footer(text=f"Страница {len(self.cursors)}")
+
+        self.previous_page.disabled = len(self.cursors) == 1
+        self.next_page.disabled = self.next_cursor is None
+        return embed
+
+    @discord.ui.button(emoji="◀️", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.cursors.pop()
+        await interaction.response.edit_message(embed=await self.build_embed(), view=self)
+
+    @discord.ui.button(emoji="▶️", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.cursors.append(self.next_cursor)
+        await interaction.response.edit_message(embed=await self.build_embed(), view=self)
 
 
 class Economy(commands.Cog):
@@ -30,10 +113,21 @@ class Economy(commands.Cog):
         self.bot = bot
         self.db = Database()
         self.log_channel = None
+        self.leaderboard = Leaderboard(self.db, size=LEADERBOARD_SIZE,
+                                       refresh_interval=LEADERBOARD_REFRESH_INTERVAL,
+                                       writes_threshold=LEADERBOARD_WRITES_THRESHOLD)
+        self.catalog = BusinessCatalog(self.db)
 
     async def cog_load(self):
-        await create_tables()
         self.log_channel = self.bot.get_channel(LOG_CHANNEL_ID)
+        await self.catalog.load()
+        await self.leaderboard.refresh()
+        self.leaderboard.start()
+        ledger.start()
+
+    async def cog_unload(self):
+        await self.leaderboard.stop()
+        await ledger.stop()
 
     async def send_log(self, embed: discord.Embed):
         if self.log_channel:
@@ -55,23 +149,30 @@ class Economy(commands.Cog):
 
     @app_commands.command(name="топ", description="🏆 Показывает топ-10 самых богатых пользователей.")
     async def top(self, inter: discord.Interaction):
-        top_users_db = await self.db.get_top_users(10)
         embed = discord.Embed(title="👑 Зал славы богачей", description="Топ-10 пользователей сервера по общему балансу.", color=discord.Color.blurple())
-        description = [f"`{i + 1}.` **{(self.bot.get_user(user_db.user_id) or f'ID: {user_db.user_id}').display_name}** — `{user_db.total:,}` 🪙" for i, user_db in enumerate(top_users_db)]
+        description = []
+        for i, user_db in enumerate(self.leaderboard.top(10)):
+            user = self.bot.get_user(user_db.user_id)
+            username = user.display_name if user else f"ID: {user_db.user_id}"
+            description.append(f"`{i + 1}.` **{username}** — `{user_db.total:,}` 🪙")
         embed.description = "\n".join(description) if description else "Пока что здесь пусто..."
+        position = await self.db.get_user_position(inter.user.id)
+        if position:
+            embed.set_footer(text=f"Ваше место: #{position}")
         await inter.response.send_message(embed=embed)
 
+    @app_commands.command(name="история", description="📜 Показывает историю ваших операций с деньгами.")
+    async def history(self, inter: discord.Interaction):
+        view = HistoryView(inter.user.id)
+        await inter.response.send_message(embed=await view.build_embed(), view=view, ephemeral=True)
+
     @app_commands.command(name="ежедневка", description=f"🎁 Получить ежедневный {DAILY_REWARD_NAME}.")
     async def daily(self, inter: discord.Interaction):
-        user = await self.db.get_user(inter.user.id)
-        now = datetime.utcnow()
-        if user and user.last_daily and now - user.last_daily < DAILY_COOLDOWN:
-            remaining = (user.last_daily + DAILY_COOLDOWN) - now
+        reward = random.randint(1500, 3000)
+        claimed, remaining = await self.db.claim_reward(inter.user.id, 'last_daily', DAILY_COOLDOWN, reward)
+        if not claimed:
             return await inter.response.send_message(f"⏳ {DAILY_REWARD_NAME} будет доступен через: {str(remaining).split('.')[0]}.", ephemeral=True)
 
-        reward = random.randint(1500, 3000)
-        await self.db.update_balance(inter.user.id, cash_delta=reward)
-        await self.db.update_cooldown(inter.user.id, 'last_daily')
         embed = discord.Embed(title=f"✨ {DAILY_REWARD_NAME}", description=f"Вы получили свой ежедневный дар в размере **{reward:,}** 🪙!", color=discord.Color.green())
         await inter.response.send_message(embed=embed)
         log_embed = discord.Embed(title="📝 Лог: Ежедневная награда", color=discord.Color.blue())
@@ -81,15 +182,11 @@ class Economy(commands.Cog):
 
     @app_commands.command(name="работа", description="🛠️ Поработать и получить немного монет.")
     async def work(self, inter: discord.Interaction):
-        user = await self.db.get_user(inter.user.id)
-        now = datetime.utcnow()
-        if user and user.last_work and now - user.last_work < WORK_COOLDOWN:
-            remaining = (user.last_work + WORK_COOLDOWN) - now
+        earnings = random.randint(300, 800)
+        claimed, remaining = await self.db.claim_reward(inter.user.id, 'last_work', WORK_COOLDOWN, earnings)
+        if not claimed:
             return await inter.response.send_message(f"⏳ Вы сможете снова работать через: {str(remaining).split('.')[0]}.", ephemeral=True)
 
-        earnings = random.randint(300, 800)
-        await self.db.update_balance(inter.user.id, cash_delta=earnings)
-        await self.db.update_cooldown(inter.user.id, 'last_work')
         embed = discord.Embed(title="💪 Тяжкий труд", description=f"Вы усердно поработали и заработали **{earnings:,}** 🪙!", color=discord.Color.green())
         await inter.response.send_message(embed=embed)
         log_embed = discord.Embed(title="📝 Лог: Работа", color=discord.Color.blue())
@@ -100,12 +197,6 @@ class Economy(commands.Cog):
     @app_commands.command(name="украсть", description="🎭 Попытаться украсть монеты у другого пользователя.")
     @app_commands.describe(жертва="Пользователь, которого вы хотите ограбить.")
     async def steal(self, inter: discord.Interaction, жертва: discord.Member):
-        user = await self.db.get_user(inter.user.id)
-        now = datetime.utcnow()
-        if user and user.last_steal and now - user.last_steal < STEAL_COOLDOWN:
-            remaining = (user.last_steal + STEAL_COOLDOWN) - now
-            return await inter.response.send_message(f"⏳ Вы сможете снова воровать через: {str(remaining).split('.')[0]}.", ephemeral=True)
-
         if жертва.id == inter.user.id:
             return await inter.response.send_message("Вы не можете ограбить самого себя!", ephemeral=True)
         if жертва.bot:
@@ -115,12 +206,14 @@ class Economy(commands.Cog):
         if not victim_db or victim_db.cash < 100:
             return await inter.response.send_message(f"У {жертва.display_name} почти нет наличных, красть нечего.", ephemeral=True)
 
-        await self.db.update_cooldown(inter.user.id, 'last_steal')
+        claimed, remaining = await self.db.claim_reward(inter.user.id, 'last_steal', STEAL_COOLDOWN)
+        if not claimed:
+            return await inter.response.send_message(f"⏳ Вы сможете снова воровать через: {str(remaining).split('.')[0]}.", ephemeral=True)
+
         success_chance = random.randint(10, 15)
-        if random.randint(1, 100) <= success_chance:
-            stolen_amount = int(victim_db.cash * 0.20)
-            await self.db.update_balance(inter.user.id, cash_delta=stolen_amount)
-            await self.db.update_balance(жертва.id, cash_delta=-stolen_amount)
+        stolen_amount = int(victim_db.cash * 0.20)
+        # Если жертва успела потратить деньги, условное списание не пройдёт — считаем это провалом
+        if random.randint(1, 100) <= success_chance and await self.db.transfer(жертва.id, inter.user.id, stolen_amount, kind='steal'):
             embed = discord.Embed(title="✅ Удачное ограбление", description=f"Вам удалось незаметно вытащить **{stolen_amount:,}** 🪙 из карманов {жертва.mention}!", color=discord.Color.green())
             await inter.response.send_message(embed=embed)
             log_embed = discord.Embed(title="📝 Лог: Ограбление (Успех)", color=0xf2ac52)
@@ -135,19 +228,13 @@ class Economy(commands.Cog):
 
     @app_commands.command(name="собрать_прибыль", description="💼 Собрать доход со всех ваших бизнесов.")
     async def collect_income(self, inter: discord.Interaction):
-        user = await self.db.get_user(inter.user.id)
-        now = datetime.utcnow()
-        if user and user.last_collect and now - user.last_collect < COLLECT_COOLDOWN:
-            remaining = (user.last_collect + COLLECT_COOLDOWN) - now
-            return await inter.response.send_message(f"⏳ Вы сможете собрать прибыль снова через: {str(remaining).split('.')[0]}.", ephemeral=True)
-
-        user_businesses = await self.db.get_user_businesses(inter.user.id)
-        if not user_businesses:
-            return await inter.response.send_message("У вас нет бизнесов для сбора прибыли.", ephemeral=True)
+        total_income = await self.db.collect_income(inter.user.id)
+        if total_income is None:
+            rate, _ = await self.db.get_pending_income(inter.user.id)
+            if not rate:
+                return await inter.response.send_message("У вас нет бизнесов для сбора прибыли.", ephemeral=True)
+            return await inter.response.send_message(f"⏳ Доход ещё не накопился. Ваши бизнесы приносят `{rate:,}` 🪙 каждые {INCOME_PERIOD_HOURS} ч.", ephemeral=True)
 
-        total_income = sum(ub.business_info.income for ub in user_businesses)
-        await self.db.update_balance(inter.user.id, cash_delta=total_income)
-        await self.db.update_cooldown(inter.user.id, 'last_collect')
         embed = discord.Embed(title="🤑 Прибыль собрана!", description=f"Ваши бизнесы принесли вам доход в размере **{total_income:,}** 🪙.", color=discord.Color.green())
         await inter.response.send_message(embed=embed)
         log_embed = discord.Embed(title="📝 Лог: Сбор прибыли", color=0x9b59b6)
@@ -159,11 +246,8 @@ class Economy(commands.Cog):
     async def pay(self, inter: discord.Interaction, получатель: discord.Member, сумма: app_commands.Range[int, 1]):
         if получатель.id == inter.user.id or получатель.bot:
             return await inter.response.send_message("Неверная цель для перевода.", ephemeral=True)
-        sender_db = await self.db.get_user(inter.user.id)
-        if not sender_db or sender_db.cash < сумма:
+        if await self.db.transfer(inter.user.id, получатель.id, сумма) is None:
             return await inter.response.send_message("У вас недостаточно наличных для такого перевода.", ephemeral=True)
-        await self.db.update_balance(inter.user.id, cash_delta=-сумма)
-        await self.db.update_balance(получатель.id, cash_delta=сумма)
         embed = discord.Embed(title="✅ Перевод выполнен", description=f"Вы успешно перевели **{сумма:,}** 🪙 пользователю {получатель.mention}.", color=discord.Color.green())
         await inter.response.send_message(embed=embed)
         log_embed = discord.Embed(title="📝 Лог: Перевод", color=discord.Color.light_grey())
@@ -173,66 +257,71 @@ class Economy(commands.Cog):
     @app_commands.command(name="положить", description="📥 Положить деньги в банк (комиссия 2%).")
     @app_commands.describe(сумма="Сумма для внесения. Введите 'все' чтобы положить всё.")
     async def deposit(self, inter: discord.Interaction, сумма: str):
-        user_db = await self.db.get_user(inter.user.id)
-        user_cash = user_db.cash if user_db else 0
-        try: amount = int(сумма) if сумма.lower() != 'все' else user_cash
-        except ValueError: return await inter.response.send_message("Пожалуйста, введите число или слово 'все'.", ephemeral=True)
+        if сумма.lower() == 'все':
+            user_db = await self.db.get_user(inter.user.id)
+            amount = user_db.cash if user_db else 0
+        else:
+            try: amount = int(сумма)
+            except ValueError: return await inter.response.send_message("Пожалуйста, введите число или слово 'все'.", ephemeral=True)
         if amount <= 0: return await inter.response.send_message("Сумма должна быть положительной.", ephemeral=True)
-        if user_cash < amount: return await inter.response.send_message("У вас недостаточно наличных.", ephemeral=True)
         fee = int(amount * BANK_FEE)
         final_amount = amount - fee
-        await self.db.update_balance(inter.user.id, cash_delta=-amount, bank_delta=final_amount)
+        if await self.db.transfer(inter.user.id, inter.user.id, amount, 'cash', 'bank', credit_amount=final_amount, kind='deposit') is None:
+            return await inter.response.send_message("У вас недостаточно наличных.", ephemeral=True)
         embed = discord.Embed(title="🏦 Банковская операция", description=f"Вы положили на счет **{final_amount:,}** 🪙.\nКомиссия составила: `{fee:,}` 🪙.", color=discord.Color.blue())
         await inter.response.send_message(embed=embed)
 
     @app_commands.command(name="снять", description="📤 Снять деньги с банковского счета (комиссия 2%).")
     @app_commands.describe(сумма="Сумма для снятия. Введите 'все' чтобы снять всё.")
     async def withdraw(self, inter: discord.Interaction, сумма: str):
-        user_db = await self.db.get_user(inter.user.id)
-        user_bank = user_db.bank if user_db else 0
-        try: amount = int(сумма) if сумма.lower() != 'все' else user_bank
-        except ValueError: return await inter.response.send_message("Пожалуйста, введите число или слово 'все'.", ephemeral=True)
+        if сумма.lower() == 'все':
+            user_db = await self.db.get_user(inter.user.id)
+            amount = user_db.bank if user_db else 0
+        else:
+            try: amount = int(сумма)
+            except ValueError: return await inter.response.send_message("Пожалуйста, введите число или слово 'все'.", ephemeral=True)
         if amount <= 0: return await inter.response.send_message("Сумма должна быть положительной.", ephemeral=True)
-        if user_bank < amount: return await inter.response.send_message("У вас недостаточно средств в банке.", ephemeral=True)
         fee = int(amount * BANK_FEE)
         final_amount = amount - fee
-        await self.db.update_balance(inter.user.id, cash_delta=final_amount, bank_delta=-amount)
+        if await self.db.transfer(inter.user.id, inter.user.id, amount, 'bank', 'cash', credit_amount=final_amount, kind='withdraw') is None:
+            return await inter.response.send_message("У вас недостаточно средств в банке.", ephemeral=True)
         embed = discord.Embed(title="🏦 Банковская операция", description=f"Вы сняли со счета **{final_amount:,}** 🪙.\nКомиссия составила: `{fee:,}` 🪙.", color=discord.Color.blue())
         await inter.response.send_message(embed=embed)
 
     @app_commands.command(name="бизнес", description="🏪 Посмотреть список доступных бизнесов.")
     async def business_list(self, inter: discord.Interaction):
-        all_businesses = await self.db.get_all_businesses()
+        all_businesses = self.catalog.all()
         embed = discord.Embed(title="📈 Каталог бизнесов", color=0x3498db)
         if not all_businesses:
             embed.description = "В данный момент нет доступных бизнесов. Загляните позже!"
         else:
+            owned_counts = await self.db.count_owned_by_type()
             for business in all_businesses:
-                owned_count = await self.db.count_owned_businesses(business.id)
-                remaining = business.limit - owned_count
+                remaining = business.limit - owned_counts.get(business.id, 0)
                 embed.add_field(name=f"{business.name} (ID: {business.id})", value=f"**Цена:** `{business.price:,}` 🪙\n**Доход:** `{business.income:,}` 🪙\n**Осталось:** `{remaining}/{business.limit}` шт.", inline=True)
         await inter.response.send_message(embed=embed)
 
     @app_commands.command(name="мои_бизнесы", description="🏢 Посмотреть список ваших бизнесов.")
     async def my_businesses(self, inter: discord.Interaction):
-        user_businesses = await self.db.get_user_businesses(inter.user.id)
+        user_businesses = [(ub_id, b) for ub_id, business_id in await self.db.get_user_business_ids(inter.user.id)
+                           if (b := self.catalog.get(business_id))]
         embed = discord.Embed(title=f"🏭 Бизнесы {inter.user.display_name}", color=0xe67e22)
         if not user_businesses:
             embed.description = "У вас пока нет ни одного бизнеса. Время это исправить!"
         else:
-            total_income = sum(ub.business_info.income for ub in user_businesses)
-            desc_lines = [f"• **{ub.business_info.name}** (ID: `{ub.id}`) - Доход: `{ub.business_info.income:,}` 🪙" for ub in user_businesses]
+            total_income, pending = await self.db.get_pending_income(inter.user.id)
+            desc_lines = [f"• **{b.name}** (ID: `{ub_id}`) - Доход: `{b.income:,}` 🪙" for ub_id, b in user_businesses]
             embed.description = "\n".join(desc_lines)
-            embed.set_footer(text=f"Общий доход с бизнесов: {total_income:,} 🪙")
+            embed.set_footer(text=f"Общий доход с бизнесов: {total_income:,} 🪙 за {INCOME_PERIOD_HOURS} ч • Накоплено: {pending:,} 🪙")
         await inter.response.send_message(embed=embed)
 
     @app_commands.command(name="бизинфо", description="ℹ️ Показывает детальную информацию о вашем бизнесе.")
     @app_commands.describe(id="ID вашего бизнеса из команды /мои_бизнесы")
     async def business_info(self, inter: discord.Interaction, id: int):
-        user_business = await self.db.get_user_business_by_id(id)
-        if not user_business or user_business.user_id != inter.user.id:
+        row = await self.db.get_user_business_row(id)
+        business_info = self.catalog.get(row[1]) if row else None
+        if not business_info or row[0] != inter.user.id:
             return await inter.response.send_message("🚫 У вас нет бизнеса с таким ID.", ephemeral=True)
-        business_info = user_business.business_info
         sell_price = int(business_info.price * BUSINESS_SELL_PERCENTAGE)
         embed = discord.Embed(title=f"ℹ️ Информация о бизнесе «{business_info.name}»", color=0x3498db)
         embed.add_field(name="💵 Доход", value=f"`{business_info.income:,}` 🪙", inline=True).add_field(name="💰 Цена покупки", value=f"`{business_info.price:,}` 🪙", inline=True).add_field(name="📉 Цена продажи", value=f"`{sell_price:,}` 🪙 ({int(BUSINESS_SELL_PERCENTAGE * 100)}%)", inline=True)
@@ -241,18 +330,14 @@ class Economy(commands.Cog):
     @app_commands.command(name="купить_бизнес", description="💰 Купить бизнес по его ID.")
     @app_commands.describe(id="ID бизнеса из команды /бизнес")
     async def buy_business(self, inter: discord.Interaction, id: int):
-        business = await self.db.get_business_by_id(id)
-        if not business:
+        business = self.catalog.get(id)
+        result = await self.db.purchase_business(inter.user.id, id) if business else 'not_found'
+        if result == 'not_found':
             return await inter.response.send_message("🚫 Бизнес с таким ID не найден.", ephemeral=True)
-        user_db = await self.db.get_user(inter.user.id)
-        user_cash = user_db.cash if user_db else 0
-        if user_cash < business.price:
+        if result == 'no_money':
             return await inter.response.send_message("💸 У вас недостаточно наличных для покупки.", ephemeral=True)
-        owned_count = await self.db.count_owned_businesses(business.id)
-        if owned_count >= business.limit:
+        if result == 'sold_out':
             return await inter.response.send_message("📉 Этот тип бизнеса уже распродан.", ephemeral=True)
-        await self.db.update_balance(inter.user.id, cash_delta=-business.price)
-        await self.db.purchase_business(inter.user.id, business.id)
         embed = discord.Embed(title="🤝 Сделка совершена!", description=f"Поздравляем! Вы приобрели бизнес **«{business.name}»** за `{business.price:,}` 🪙.", color=discord.Color.green())
         await inter.response.send_message(embed=embed)
         log_embed = discord.Embed(title="📝 Лог: Покупка бизнеса", color=0x2ecc71)
@@ -262,13 +347,13 @@ class Economy(commands.Cog):
     @app_commands.command(name="продать_бизнес", description="📉 Продать ваш бизнес по его ID.")
     @app_commands.describe(id="ID вашего бизнеса из команды /мои_бизнесы")
     async def sell_business(self, inter: discord.Interaction, id: int):
-        user_business = await self.db.get_user_business_by_id(id)
-        if not user_business or user_business.user_id != inter.user.id:
+        row = await self.db.get_user_business_row(id)
+        business_info = self.catalog.get(row[1]) if row else None
+        if not business_info or row[0] != inter.user.id:
             return await inter.response.send_message("🚫 У вас нет бизнеса с таким ID.", ephemeral=True)
-        business_info = user_business.business_info
         sell_price = int(business_info.price * BUSINESS_SELL_PERCENTAGE)
-        await self.db.sell_business(user_business.id)
-        await self.db.update_balance(inter.user.id, cash_delta=sell_price)
+        if not await self.db.sell_business(inter.user.id, id, sell_price):
+            return await inter.response.send_message("🚫 У вас нет бизнеса с таким ID.", ephemeral=True)
         embed = discord.Embed(title="🤝 Бизнес продан", description=f"Вы продали **«{business_info.name}»** и получили **{sell_price:,}** 🪙.", color=0xe74c3c)
         await inter.response.send_message(embed=embed)
         log_embed = discord.Embed(title="📝 Лог: Продажа бизнеса", color=0xc27c0e)
@@ -281,9 +366,7 @@ class Economy(commands.Cog):
     @app_commands.checks.has_role(ADMIN_ROLE_ID)
     @app_commands.describe(пользователь="Кому выдать деньги.", сумма="Сколько денег выдать.", куда="Куда зачислить средства: на руки или в банк.")
     async def give_money(self, inter: discord.Interaction, пользователь: discord.Member, сумма: app_commands.Range[int, 1], куда: Literal['наличные', 'банк']):
-        cash_delta = сумма if куда == 'наличные' else 0
-        bank_delta = сумма if куда == 'банк' else 0
-        await self.db.update_balance(пользователь.id, cash_delta=cash_delta, bank_delta=bank_delta)
+        await self.db.transfer(None, пользователь.id, сумма, to_account=ACCOUNT_COLUMNS[куда], kind='admin_give')
         await inter.response.send_message(f"✅ Вы успешно выдали `{сумма:,}` 🪙 пользователю {пользователь.mention} на счет «{куда}».", ephemeral=True)
         log_embed = discord.Embed(title="📝 Лог: Админ | Выдача средств", color=0x2ecc71)
         log_embed.add_field(name="Администратор", value=inter.user.mention).add_field(name="Получатель", value=пользователь.mention).add_field(name="Сумма", value=f"`{сумма:,}` 🪙").add_field(name="Счет", value=куда.capitalize())
@@ -293,18 +376,13 @@ class Economy(commands.Cog):
     @app_commands.checks.has_role(ADMIN_ROLE_ID)
     @app_commands.describe(пользователь="У кого отобрать деньги.", сумма="Сколько денег отобрать.", откуда="Откуда списать средства: с наличных или из банка.")
     async def take_money(self, inter: discord.Interaction, пользователь: discord.Member, сумма: app_commands.Range[int, 1], откуда: Literal['наличные', 'банк']):
-        user_db = await self.db.get_user(пользователь.id)
-        if откуда == 'наличные':
-            user_cash = user_db.cash if user_db else 0
-            if user_cash < сумма:
+        if await self.db.transfer(пользователь.id, None, сумма, from_account=ACCOUNT_COLUMNS[откуда], kind='admin_take') is None:
+            user_db = await self.db.get_user(пользователь.id)
+            if откуда == 'наличные':
+                user_cash = user_db.cash if user_db else 0
                 return await inter.response.send_message(f"🚫 Недостаточно наличных у пользователя ({user_cash:,} 🪙).", ephemeral=True)
-        if откуда == 'банк':
             user_bank = user_db.bank if user_db else 0
-            if user_bank < сумма:
-                return await inter.response.send_message(f"🚫 Недостаточно средств в банке у пользователя ({user_bank:,} 🪙).", ephemeral=True)
-        cash_delta = -сумма if откуда == 'наличные' else 0
-        bank_delta = -сумма if откуда == 'банк' else 0
-        await self.db.update_balance(пользователь.id, cash_delta=cash_delta, bank_delta=bank_delta)
+            return await inter.response.send_message(f"🚫 Недостаточно средств в банке у пользователя ({user_bank:,} 🪙).", ephemeral=True)
         await inter.response.send_message(f"✅ Вы успешно отобрали `{сумма:,}` 🪙 у пользователя {пользователь.mention} со счета «{откуда}».", ephemeral=True)
         log_embed = discord.Embed(title="📝 Лог: Админ | Изъятие средств", color=0xe74c3c)
         log_embed.add_field(name="Администратор", value=inter.user.mention).add_field(name="Пользователь", value=пользователь.mention).add_field(name="Сумма", value=f"`{сумма:,}` 🪙").add_field(name="Счет", value=откуда.capitalize())
@@ -312,11 +390,12 @@ class Economy(commands.Cog):
 
     @app_commands.command(name="добавить_бизнес", description="👑 (Админ) Добавить новый тип бизнеса в магазин.")
     @app_commands.checks.has_role(ADMIN_ROLE_ID)
-    @app_commands.describe(название="Название бизнеса (напр., 'IT-стартап')", цена="Стоимость покупки", доход="Прибыль за один сбор", количество="Сколько всего таких бизнесов может быть на сервере")
+    @app_commands.describe(название="Название бизнеса (напр., 'IT-стартап')", цена="Стоимость покупки", доход=f"Прибыль за каждые {INCOME_PERIOD_HOURS} ч владения", количество="Сколько всего таких бизнесов может быть на сервере")
     async def add_business(self, inter: discord.Interaction, название: str, цена: int, доход: int, количество: int):
         success = await self.db.add_business(название, цена, доход, количество)
         if not success:
             return await inter.response.send_message(f"🚫 Бизнес с названием «{название}» уже существует.", ephemeral=True)
+        await self.catalog.load()
         embed = discord.Embed(title="✅ Бизнес добавлен", description=f"Новый бизнес **«{название}»** успешно добавлен в магазин.", color=discord.Color.dark_green())
         await inter.response.send_message(embed=embed, ephemeral=True)
         log_embed = discord.Embed(title="📝 Лог: Админ | Добавлен бизнес", color=0x71368a)
@@ -327,7 +406,7 @@ class Economy(commands.Cog):
     @app_commands.checks.has_role(ADMIN_ROLE_ID)
     @app_commands.describe(id="ID бизнеса, который нужно удалить из команды /бизнес")
     async def delete_business(self, inter: discord.Interaction, id: int):
-        business = await self.db.get_business_by_id(id)
+        business = self.catalog.get(id)
         business_name = business.name if business else f"ID: {id}"
 
         result = await self.db.delete_business_type(id)
@@ -341,6 +420,7 @@ class Economy(commands.Cog):
                 ephemeral=True)
 
         if result == 'success':
+            await self.catalog.load()
             await inter.response.send_message(f"✅ Бизнес «{business_name}» был успешно удален из магазина.",
                                               ephemeral=True)
 
@@ -349,6 +429,11 @@ class Economy(commands.Cog):
             log_embed.add_field(name="Удаленный бизнес", value=business_name)
             await self.send_log(log_embed)
 
+    @commands.Cog.listener()
+    async def on_app_command_completion(self, inter: discord.Interaction, command: app_commands.Command):
+        if command.name in BALANCE_COMMANDS:
+            self.leaderboard.note_write()
+
     @commands.Cog.listener()
     async def on_app_command_error(self, inter: discord.Interaction, error):
         if isinstance(error, app_commands.CommandOnCooldown):
@@ -7,7 +7,6 @@ from discord import app_commands
 from discord.ext import commands
 
 from database.warn.functions import Database
-from database.warn.connection import create_tables
 
 LOG_CHANNEL_ID = 1400850936640831630
 OWNER_ROLES = [1405996238519926984]
@@ -61,7 +60,6 @@ class Moderation(commands.Cog):
 
     @commands.Cog.listener()
     async def on_ready(self):
-        await create_tables()
         self.log_channel = await self._resolve_channel(LOG_CHANNEL_ID)
         self.alert_channel = await self._resolve_channel(ALERT_CHANNEL_ID)
         print("Moderation Cog is Ready ✅")
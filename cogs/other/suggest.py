@@ -1,26 +1,24 @@
+import asyncio
+import os
 import discord
 from discord import app_commands
 from discord.ext import commands
 from discord.ui import View, Button, Modal, TextInput
 import datetime
-from typing import Optional, Dict
+from collections import OrderedDict
+from typing import Optional
 
+from database.suggest.functions import SuggestDatabase
+from database.suggest.models import Suggestion
 
-class Suggestion:
-    def __init__(self, author_id: int, message_id: int, channel_id: int, text: str):
-        self.author_id = author_id
-        self.message_id = message_id
-        self.channel_id = channel_id
-        self.text = text
-        self.status = "pending"
-        self.upvotes = set()
-        self.downvotes = set()
-
-    def count_upvotes(self) -> int:
-        return len(self.upvotes)
-
-    def count_downvotes(self) -> int:
-        return len(self.downvotes)
+SUGGESTION_CACHE_SIZE = 256  # сколько недавно активных предложений держать в памяти
+# Не чаще одной правки эмбеда за столько секунд на сообщение: голоса между правками сливаются в одну
+SUGGEST_EDIT_INTERVAL = float(os.getenv("SUGGEST_EDIT_INTERVAL", "2.0"))
+STATUS_FOOTERS = {
+    "pending": "Статус: На рассмотрении",
+    "accepted": "Статус: ✅ Принята",
+    "rejected": "Статус: ❌ Отклонена",
+}
 
 
 class SuggestModal(Modal, title="💡 Новое предложение"):
@@ -61,9 +59,8 @@ class SuggestModal(Modal, title="💡 Новое предложение"):
         view = SuggestVoteView(self.cog)
         message = await channel.send(embed=embed, view=view)
 
-        # Сохраняем в память
-        suggestion = Suggestion(interaction.user.id, message.id, channel.id, idea_text)
-        self.cog.suggestions[message.id] = suggestion
+        suggestion = await self.cog.db.create_suggestion(message.id, channel.id, interaction.user.id, idea_text)
+        self.cog.remember(suggestion)
 
         await interaction.response.send_message("✅ Твоя идея отправлена!", ephemeral=True)
 
@@ -75,57 +72,120 @@ class SuggestVoteView(View):
 
     @discord.ui.button(label="0", emoji="👍", style=discord.ButtonStyle.green, custom_id="suggest_upvote")
     async def upvote(self, interaction: discord.Interaction, button: Button):
-        s = self.cog.suggestions.get(interaction.message.id)
-        if not s:
-            await interaction.response.send_message("⚠️ Ошибка: предложение не найдено.", ephemeral=True)
-            return
-
-        user_id = interaction.user.id
-        if user_id in s.downvotes:
-            s.downvotes.remove(user_id)
-        if user_id in s.upvotes:
-            s.upvotes.remove(user_id)
-        else:
-            s.upvotes.add(user_id)
-
-        await self.update_message(interaction, s)
+        await self.vote(interaction, 1)
 
     @discord.ui.button(label="0", emoji="👎", style=discord.ButtonStyle.red, custom_id="suggest_downvote")
     async def downvote(self, interaction: discord.Interaction, button: Button):
-        s = self.cog.suggestions.get(interaction.message.id)
+        await self.vote(interaction, -1)
+
+    async def vote(self, interaction: discord.Interaction, value: int):
+        # Клик подтверждаем сразу, эмбед обновится позже одной правкой на пачку голосов
+        await interaction.response.defer()
+        s = await self.cog.get_suggestion(interaction.message.id)
         if not s:
-            await interaction.response.send_message("⚠️ Ошибка: предложение не найдено.", ephemeral=True)
+            await interaction.followup.send("⚠️ Ошибка: предложение не найдено.", ephemeral=True)
             return
 
-        user_id = interaction.user.id
-        if user_id in s.upvotes:
-            s.upvotes.remove(user_id)
-        if user_id in s.downvotes:
-            s.downvotes.remove(user_id)
-        else:
-            s.downvotes.add(user_id)
-
-        await self.update_message(interaction, s)
-
-    async def update_message(self, interaction: discord.Interaction, s: Suggestion):
-        upvotes, downvotes = s.count_upvotes(), s.count_downvotes()
-        embed = interaction.message.embeds[0]
-        embed.set_field_at(0, name="👍 За", value=str(upvotes), inline=True)
-        embed.set_field_at(1, name="👎 Против", value=str(downvotes), inline=True)
-
-        embed.color = discord.Color.green() if upvotes > downvotes else discord.Color.red() if downvotes > upvotes else discord.Color.blurple()
+        async with self.cog.vote_lock(s.message_id):
+            counts = await self.cog.db.toggle_vote(s.message_id, interaction.user.id, value)
+        if counts is None:
+            self.cog.forget(s.message_id)
+            await interaction.followup.send("⚠️ Ошибка: предложение не найдено.", ephemeral=True)
+            return
 
-        await interaction.message.edit(embed=embed, view=self)
-        await interaction.response.defer()
+        s.upvotes, s.downvotes = counts
+        self.cog.schedule_edit(interaction.message, s)
 
 
 class SuggestCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         self.suggest_channel_id: Optional[int] = None
-        self.suggestions: Dict[int, Suggestion] = {}  # message_id -> Suggestion
+        self.db = SuggestDatabase()
+        # message_id -> Suggestion; остальные поднимаются из БД при первом нажатии кнопки
+        self.cache: OrderedDict[int, Suggestion] = OrderedDict()
+        # Голоса по одному предложению применяем по очереди: счётчик меняется от прочитанного голоса
+        self.vote_locks: dict[int, asyncio.Lock] = {}
+        # Отложенные правки эмбедов: message_id -> (сообщение, предложение) и задача, которая их применяет
+        self.dirty: dict[int, tuple[discord.Message, Suggestion]] = {}
+        self.edit_tasks: dict[int, asyncio.Task] = {}
         self.bot.add_view(SuggestVoteView(self))
 
+    async def cog_unload(self):
+        # Счётчики уже в БД, теряются только ещё не показанные цифры
+        for task in self.edit_tasks.values():
+            task.cancel()
+        self.edit_tasks.clear()
+        self.dirty.clear()
+
+    def schedule_edit(self, message: discord.Message, suggestion: Suggestion):
+        self.dirty[message.id] = (message, suggestion)
+        if message.id not in self.edit_tasks:
+            self.edit_tasks[message.id] = asyncio.create_task(self.apply_edits(message.id))
+
+    async def apply_edits(self, message_id: int):
+        """Первый голос правит эмбед сразу, следующие копятся и применяются раз в SUGGEST_EDIT_INTERVAL."""
+        try:
+            while message_id in self.dirty:
+                message, s = self.dirty.pop(message_id)
+                try:
+                    await self.update_message(message, s)
+                except discord.HTTPException as e:
+                    print(f"[Suggest] Не удалось обновить голоса {message_id}: {e}")
+                await asyncio.sleep(SUGGEST_EDIT_INTERVAL)
+        finally:
+            self.edit_tasks.pop(message_id, None)
+
+    async def update_message(self, message: discord.Message, s: Suggestion):
+        # Эмбед может быть снят за несколько секунд до правки, поэтому статус берём из предложения, а не из него
+        upvotes, downvotes = s.upvotes, s.downvotes
+        embed = message.embeds[0]
+        embed.set_field_at(0, name="👍 За", value=str(upvotes), inline=True)
+        embed.set_field_at(1, name="👎 Против", value=str(downvotes), inline=True)
+        embed.set_footer(text=STATUS_FOOTERS.get(s.status, STATUS_FOOTERS["pending"]))
+
+        if s.status == "accepted":
+            embed.color = discord.Color.green()
+        elif s.status == "rejected":
+            embed.color = discord.Color.red()
+        else:
+            embed.color = discord.Color.green() if upvotes > downvotes else discord.Color.red() if downvotes > upvotes else discord.Color.blurple()
+
+        await message.edit(embed=embed)
+
+    async def decide(self, s: Suggestion, message: discord.Message, status: str):
+        await self.db.set_status(s.message_id, status)
+        s.status = status
+        # Отложенная правка голосов больше не нужна: эта уже покажет свежие цифры вместе со статусом
+        self.dirty.pop(s.message_id, None)
+        await self.update_message(message, s)
+
+    def remember(self, suggestion: Suggestion):
+        self.cache[suggestion.message_id] = suggestion
+        self.cache.move_to_end(suggestion.message_id)
+        while len(self.cache) > SUGGESTION_CACHE_SIZE:
+            message_id, _ = self.cache.popitem(last=False)
+            lock = self.vote_locks.get(message_id)
+            if lock and not lock.locked():
+                del self.vote_locks[message_id]
+
+    def forget(self, message_id: int):
+        self.cache.pop(message_id, None)
+        self.vote_locks.pop(message_id, None)
+
+    def vote_lock(self, message_id: int) -> asyncio.Lock:
+        return self.vote_locks.setdefault(message_id, asyncio.Lock())
+
+    async def get_suggestion(self, message_id: int) -> Suggestion | None:
+        suggestion = self.cache.get(message_id)
+        if suggestion is not None:
+            self.cache.move_to_end(message_id)
+            return suggestion
+        suggestion = await self.db.get_suggestion(message_id)
+        if suggestion is not None:
+            self.remember(suggestion)
+        return suggestion
+
     # ---------- Команды ----------
 
     @app_commands.command(name="предложить", description="💡 Отправить идею или предложение для сервера.")
@@ -143,7 +203,7 @@ class SuggestCog(commands.Cog):
     @app_commands.checks.has_permissions(administrator=True)
     async def accept(self, inter: discord.Interaction, message_id: str):
         msg_id = int(message_id)
-        s = self.suggestions.get(msg_id)
+        s = await self.get_suggestion(msg_id)
         if not s:
             await inter.response.send_message("❌ Идея не найдена.", ephemeral=True)
             return
@@ -155,11 +215,7 @@ class SuggestCog(commands.Cog):
 
         try:
             message = await channel.fetch_message(s.message_id)
-            embed = message.embeds[0]
-            embed.color = discord.Color.green()
-            embed.set_footer(text="Статус: ✅ Принята")
-            await message.edit(embed=embed)
-            s.status = "accepted"
+            await self.decide(s, message, "accepted")
             await inter.response.send_message(f"✅ Идея {s.message_id} принята!", ephemeral=True)
         except Exception as e:
             await inter.response.send_message(f"⚠️ Ошибка при изменении идеи: {e}", ephemeral=True)
@@ -168,7 +224,7 @@ class SuggestCog(commands.Cog):
     @app_commands.checks.has_permissions(administrator=True)
     async def reject(self, inter: discord.Interaction, message_id: str):
         msg_id = int(message_id)
-        s = self.suggestions.get(msg_id)
+        s = await self.get_suggestion(msg_id)
         if not s:
             await inter.response.send_message("❌ Идея не найдена.", ephemeral=True)
             return
@@ -180,11 +236,7 @@ class SuggestCog(commands.Cog):
 
         try:
             message = await channel.fetch_message(s.message_id)
-            embed = message.embeds[0]
-            embed.color = discord.Color.red()
-            embed.set_footer(text="Статус: ❌ Отклонена")
-            await message.edit(embed=embed)
-            s.status = "rejected"
+            await self.decide(s, message, "rejected")
             await inter.response.send_message(f"❌ Идея {s.message_id} отклонена.", ephemeral=True)
         except Exception as e:
             await inter.response.send_message(f"⚠️ Ошибка при изменении идеи: {e}", ephemeral=True)
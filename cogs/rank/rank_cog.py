@@ -1,14 +1,55 @@
 # cogs/rank/rank_cog.py
+import math
+
 import discord
 from discord import app_commands
 from discord.ext import commands
 
-from database.rank.functions import RankDatabase
-from database.rank.connection import create_rank_tables
+from database.rank.functions import RankDatabase, apply_level_ups
 from database.rank.models import RankUser
+from database.rank.buffer import XPBuffer
+from database.rank.index import RankIndex
 
 LOG_CHANNEL_ID = 1407738293830942730
 ADMIN_ROLE_ID = 1399711308676595785
+LEVELUP_CHANNEL_ID = 1437102750033776800
+
+XP_PER_MESSAGE = 10
+XP_FLUSH_INTERVAL = 10.0  # секунд между сбросами опыта в БД
+XP_FLUSH_SIZE = 500  # сбросить раньше, если накопилось столько пользователей
+TOP_PAGE_SIZE = 10
+
+
+class RankTopView(discord.ui.View):
+    def __init__(self, cog: "RankCog", author_id: int, page: int):
+        super().__init__(timeout=120)
+        self.cog = cog
+        self.author_id = author_id
+        self.page = page
+        self.update_buttons()
+
+    def update_buttons(self):
+        self.previous_page.disabled = self.page <= 1
+        self.next_page.disabled = self.page >= self.cog.top_page_count()
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message("⛔ Листать может только тот, кто вызвал команду.", ephemeral=True)
+            return False
+        return True
+
+    async def show_page(self, interaction: discord.Interaction, page: int):
+        self.page = max(1, min(page, self.cog.top_page_count()))
+        self.update_buttons()
+        await interaction.response.edit_message(embed=self.cog.build_top_embed(self.page), view=self)
+
+    @discord.ui.button(emoji="◀️", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.show_page(interaction, self.page - 1)
+
+    @discord.ui.button(emoji="▶️", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.show_page(interaction, self.page + 1)
 
 
 class RankCog(commands.Cog, name="Ранги"):
@@ -17,39 +58,76 @@ class RankCog(commands.Cog, name="Ранги"):
         self.db = RankDatabase()
         self.log_channel = None
         self.no_xp_channels = set()
+        self.rank_index = RankIndex()
+        self.xp_buffer = XPBuffer(self.db, self.announce_level_up, on_flush=self.index_users,
+                                  flush_interval=XP_FLUSH_INTERVAL, max_pending=XP_FLUSH_SIZE)
 
     async def cog_load(self):
-        await create_rank_tables()
         self.log_channel = self.bot.get_channel(LOG_CHANNEL_ID)
         self.no_xp_channels = await self.db.get_no_xp_channels()
+        self.rank_index.load(await self.db.get_all_ranks())
+        self.xp_buffer.start()
+
+    async def cog_unload(self):
+        await self.xp_buffer.stop()
 
     async def send_log(self, embed: discord.Embed):
         if self.log_channel:
             await self.log_channel.send(embed=embed)
 
+    def index_users(self, users: list[RankUser]):
+        for user in users:
+            self.rank_index.update(user.user_id, user.level or 0, user.xp or 0)
+
+    def top_page_count(self) -> int:
+        return max(1, math.ceil(len(self.rank_index) / TOP_PAGE_SIZE))
+
+    def build_top_embed(self, page: int) -> discord.Embed:
+        embed = discord.Embed(
+            title="🏆 Таблица лидеров",
+            color=discord.Color.blurple()
+        )
+
+        offset = (page - 1) * TOP_PAGE_SIZE
+        lines = []
+        for i, (user_id, level, xp) in enumerate(self.rank_index.page(offset, TOP_PAGE_SIZE), start=offset + 1):
+            user = self.bot.get_user(user_id)
+            username = user.display_name if user else f"ID: {user_id}"
+            lines.append(f"`{i}.` **{username}** — Уровень **{level}** (`{xp} XP`)")
+
+        embed.description = "\n".join(lines) if lines else "Пока что здесь пусто..."
+        embed.set_footer(text=f"Страница {page}/{self.top_page_count()}")
+        return embed
+
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
         if message.author.bot or message.channel.id in self.no_xp_channels:
             return
 
-        user, leveled_up = await self.db.update_user_xp(message.author.id, 10)
-
-        if leveled_up:
-            embed = discord.Embed(
-                description=f"🎉 **Поздравляем, {message.author.mention}!**\nВы достигли **{user.level}** уровня!",
-                color=discord.Color.green()
-            )
-            levelup_channel = self.bot.get_channel(1437102750033776800)
-            if levelup_channel:
-                await levelup_channel.send(embed=embed)
-
-            log_embed = discord.Embed(
-                title="📝 Лог: Повышение уровня",
-                color=0x00aaff,
-                description=f"Пользователь {message.author.mention} достиг **{user.level}** уровня."
-            )
-            log_embed.set_author(name=message.author.display_name, icon_url=message.author.display_avatar.url)
-            await self.send_log(log_embed)
+        self.xp_buffer.add(message.author.id, XP_PER_MESSAGE, message.author)
+
+    async def announce_level_up(self, user: RankUser, old_level: int, member: discord.abc.User | None):
+        member = member or self.bot.get_user(user.user_id)
+        if member is None:
+            return
+
+        embed = discord.Embed(
+            description=f"🎉 **Поздравляем, {member.mention}!**\nВы достигли **{user.level}** уровня!",
+            color=discord.Color.green()
+        )
+        levelup_channel = self.bot.get_channel(LEVELUP_CHANNEL_ID)
+        if levelup_channel:
+            await levelup_channel.send(embed=embed)
+
+        log_embed = discord.Embed(
+            title="📝 Лог: Повышение уровня",
+            color=0x00aaff,
+            description=f"Пользователь {member.mention} достиг **{user.level}** уровня."
+        )
+        if user.level - old_level > 1:
+            log_embed.add_field(name="Уровней за раз", value=str(user.level - old_level))
+        log_embed.set_author(name=member.display_name, icon_url=member.display_avatar.url)
+        await self.send_log(log_embed)
 
     @app_commands.command(name="уровень", description="🏅 Показывает ваш текущий уровень и опыт.")
     @app_commands.describe(user="Пользователь, чей уровень вы хотите посмотреть (необязательно)")
@@ -60,41 +138,37 @@ class RankCog(commands.Cog, name="Ранги"):
         if not db_user:
             db_user = RankUser(user_id=target_user.id, level=0, xp=0)
 
-        xp_needed = (db_user.level + 1) * 100
+        # Учитываем опыт, который ещё не успел уйти в БД
+        level, xp = apply_level_ups(db_user.level or 0, (db_user.xp or 0) + self.xp_buffer.pending_xp(target_user.id))
+        xp_needed = (level + 1) * 100
 
         embed = discord.Embed(
             title=f"🏅 Ранг {target_user.display_name}",
             color=discord.Color.gold()
         )
         embed.set_thumbnail(url=target_user.display_avatar.url)
-        embed.add_field(name="Уровень", value=f"**{db_user.level}**", inline=True)
-        embed.add_field(name="Опыт", value=f"**{db_user.xp} / {xp_needed}**", inline=True)
+        embed.add_field(name="Уровень", value=f"**{level}**", inline=True)
+        embed.add_field(name="Опыт", value=f"**{xp} / {xp_needed}**", inline=True)
+        position = self.rank_index.position(target_user.id)
+        if position:
+            embed.add_field(name="Место", value=f"**#{position}** из {len(self.rank_index)}", inline=True)
         await inter.response.send_message(embed=embed)
 
-    @app_commands.command(name="ранг_топ", description="🏆 Показывает топ-10 пользователей по уровню.")
-    async def rank_top(self, inter: discord.Interaction):
-        top_users_db = await self.db.get_top_users(10)
-        embed = discord.Embed(
-            title="🏆 Таблица лидеров",
-            description="Топ-10 пользователей сервера по уровню и опыту.",
-            color=discord.Color.blurple()
-        )
-
-        lines = []
-        for i, user_db in enumerate(top_users_db):
-            user = self.bot.get_user(user_db.user_id)
-            username = user.display_name if user else f"ID: {user_db.user_id}"
-            lines.append(f"`{i + 1}.` **{username}** — Уровень **{user_db.level}** (`{user_db.xp} XP`)")
-
-        embed.description = "\n".join(lines) if lines else "Пока что здесь пусто..."
-        await inter.response.send_message(embed=embed)
+    @app_commands.command(name="ранг_топ", description="🏆 Показывает таблицу лидеров по уровню.")
+    @app_commands.describe(страница="Номер страницы таблицы (по 10 пользователей)")
+    async def rank_top(self, inter: discord.Interaction, страница: app_commands.Range[int, 1] = 1):
+        page = min(страница, self.top_page_count())
+        view = RankTopView(self, inter.user.id, page)
+        await inter.response.send_message(embed=self.build_top_embed(page), view=view)
 
     @app_commands.command(name="установить_уровень", description="👑 (Админ) Устанавливает уровень пользователю.")
     @app_commands.checks.has_role(ADMIN_ROLE_ID)
     @app_commands.describe(пользователь="Пользователь, которому нужно изменить уровень.", уровень="Новый уровень.")
     async def set_level(self, inter: discord.Interaction, пользователь: discord.Member,
                         уровень: app_commands.Range[int, 0]):
-        await self.db.set_user_rank(пользователь.id, level=уровень)
+        user = await self.xp_buffer.overwrite(пользователь.id,
+                                              lambda: self.db.set_user_rank(пользователь.id, level=уровень))
+        self.index_users([user])
         embed = discord.Embed(description=f"✅ Уровень для {пользователь.mention} установлен на **{уровень}**.",
                               color=discord.Color.green())
         await inter.response.send_message(embed=embed, ephemeral=True)
@@ -109,7 +183,8 @@ class RankCog(commands.Cog, name="Ранги"):
     @app_commands.checks.has_role(ADMIN_ROLE_ID)
     @app_commands.describe(пользователь="Пользователь, которому нужно изменить опыт.", опыт="Новое количество опыта.")
     async def set_xp(self, inter: discord.Interaction, пользователь: discord.Member, опыт: app_commands.Range[int, 0]):
-        await self.db.set_user_rank(пользователь.id, xp=опыт)
+        user = await self.xp_buffer.overwrite(пользователь.id, lambda: self.db.set_user_rank(пользователь.id, xp=опыт))
+        self.index_users([user])
         embed = discord.Embed(description=f"✅ Опыт для {пользователь.mention} установлен на **{опыт}**.",
                               color=discord.Color.green())
         await inter.response.send_message(embed=embed, ephemeral=True)
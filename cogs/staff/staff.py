@@ -1,35 +1,143 @@
+import asyncio
 import discord
 import json
 import os
+import tempfile
+from contextlib import suppress
 from discord import app_commands
 from discord.ext import commands
 
 CONFIG_FILE = "staff_config.json"
+DEFAULT_CONFIG = {"application_channel_id": None, "roles": []}
+RELOAD_INTERVAL = 5.0  # секунд между проверками mtime файла на внешние правки
+
+
+class StaffConfigStore:
+    """Разобранный staff_config.json в памяти с поиском должности по value за O(1).
+
+    Запись атомарная (временный файл + rename) и выполняется вне цикла событий.
+    Фоновая задача перечитывает файл, если его изменили снаружи (по mtime).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.config: dict = dict(DEFAULT_CONFIG)
+        self.roles_by_value: dict[str, dict] = {}
+        self.mtime: float | None = None
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def application_channel_id(self) -> int | None:
+        return self.config.get("application_channel_id")
+
+    @property
+    def roles(self) -> list[dict]:
+        return self.config.get("roles", [])
+
+    def get_role(self, value: str) -> dict | None:
+        return self.roles_by_value.get(value)
+
+    def _apply(self, config: dict, mtime: float | None):
+        # Конфиг заменяется целиком, а не правится на месте: читатели всегда видят целую версию
+        self.config = config
+        self.roles_by_value = {role["value"]: role for role in config.get("roles", [])}
+        self.mtime = mtime
+
+    def _read(self) -> tuple[dict | None, float | None]:
+        """(конфиг, mtime); конфиг None — файл повреждён."""
+        if not os.path.exists(self.path):
+            mtime = self._write(DEFAULT_CONFIG)
+            return dict(DEFAULT_CONFIG), mtime
+        try:
+            mtime = os.stat(self.path).st_mtime
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f), mtime
+        except (json.JSONDecodeError, FileNotFoundError) as e:
+            print(f"Ошибка при чтении {self.path}: {e}")
+            return None, None
+
+    def _write(self, config: dict) -> float:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".staff_config.", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(config, f, indent=4, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            with suppress(OSError):
+                os.unlink(tmp_path)
+            raise
+        return os.stat(self.path).st_mtime
+
+    async def load(self) -> bool:
+        async with self._lock:
+            config, mtime = await asyncio.to_thread(self._read)
+            if config is None:
+                # Битую правку пропускаем: остаётся последний рабочий конфиг (или пустой при запуске)
+                with suppress(OSError):
+                    self.mtime = os.stat(self.path).st_mtime
+                return False
+            self._apply(config, mtime)
+            return True
+
+    async def _save(self, config: dict):
+        """Ошибка записи (OSError) пробрасывается: конфиг в памяти тогда остаётся прежним."""
+        try:
+            mtime = await asyncio.to_thread(self._write, config)
+        except OSError as e:
+            print(f"Ошибка при сохранении {self.path}: {e}")
+            raise
+        self._apply(config, mtime)
+
+    async def set_application_channel(self, channel_id: int):
+        async with self._lock:
+            await self._save({**self.config, "application_channel_id": channel_id})
+
+    async def add_role(self, role: dict) -> bool:
+        """False — должность с таким value уже есть. OSError — не удалось сохранить."""
+        async with self._lock:
+            if role["value"] in self.roles_by_value:
+                return False
+            await self._save({**self.config, "roles": [*self.roles, role]})
+            return True
+
+    async def remove_role(self, value: str) -> bool:
+        """False — такой должности нет. OSError — не удалось сохранить."""
+        async with self._lock:
+            if value not in self.roles_by_value:
+                return False
+            await self._save({**self.config, "roles": [r for r in self.roles if r["value"] != value]})
+            return True
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(RELOAD_INTERVAL)
+            # Любая ошибка файловой системы — пропускаем круг, а не роняем слежение до перезапуска
+            try:
+                mtime = (await asyncio.to_thread(os.stat, self.path)).st_mtime
+                if mtime != self.mtime and await self.load():
+                    print(f"⚙️ {self.path} изменён снаружи, конфиг перечитан.")
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                print(f"Ошибка при проверке {self.path}: {e}")
 
 
-def load_config():
-    if not os.path.exists(CONFIG_FILE):
-        default_config = {
-            "application_channel_id": None,
-            "roles": []
-        }
-        with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-            json.dump(default_config, f, indent=4, ensure_ascii=False)
-        return default_config
-
-    try:
-        with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (json.JSONDecodeError, FileNotFoundError):
-        return {"application_channel_id": None, "roles": []}
-
-
-def save_config(config):
-    try:
-        with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-            json.dump(config, f, indent=4, ensure_ascii=False)
-    except Exception as e:
-        print(f"Ошибка при сохранении {CONFIG_FILE}: {e}")
+config_store = StaffConfigStore(CONFIG_FILE)
 
 
 class StaffApplicationModal(discord.ui.Modal, title="Заявка на должность"):
@@ -57,8 +165,7 @@ class StaffApplicationModal(discord.ui.Modal, title="Заявка на долж
         self.add_item(self.trust_input)
 
     async def on_submit(self, interaction: discord.Interaction):
-        config = load_config()
-        channel_id = config.get("application_channel_id")
+        channel_id = config_store.application_channel_id
         if not channel_id:
             return await interaction.response.send_message(
                 "⚠️ Канал для заявок не настроен. Обратитесь к администрации.", ephemeral=True)
@@ -99,10 +206,7 @@ class StaffSelectView(discord.ui.View):
         min_values=1, max_values=1
     )
     async def select_callback(self, interaction: discord.Interaction, select: discord.ui.Select):
-        config = load_config()
-        selected_value = select.values[0]
-
-        selected_role_data = next((role for role in config['roles'] if role['value'] == selected_value), None)
+        selected_role_data = config_store.get_role(select.values[0])
 
         if not selected_role_data:
             return await interaction.response.send_message("❌ Выбранная роль больше не актуальна.", ephemeral=True)
@@ -137,8 +241,7 @@ class ApplicationActionsView(discord.ui.View):
             return await interaction.response.send_message("❌ Пользователь не найден на сервере.", ephemeral=True,
                                                            delete_after=10)
 
-        config = load_config()
-        role_data = next((r for r in config['roles'] if r['value'] == role_value), None)
+        role_data = config_store.get_role(role_value)
 
         role_to_give = None
         if role_data and role_data.get('role_id'):
@@ -207,13 +310,19 @@ class Staff(commands.Cog):
         self.bot.add_view(StaffSelectView())
         self.bot.add_view(ApplicationActionsView())
 
+    async def cog_load(self):
+        await config_store.load()
+        config_store.start()
+
+    async def cog_unload(self):
+        await config_store.stop()
+
     @app_commands.command(name="staff_send_message",
                           description="👑 Отправить сообщение для набора в стафф в указанный канал.")
     @app_commands.describe(канал="Канал, куда будет отправлено сообщение с выбором должности.")
     @app_commands.checks.has_permissions(administrator=True)
     async def staff_send_message(self, interaction: discord.Interaction, канал: discord.TextChannel):
-        config = load_config()
-        roles = config.get('roles', [])
+        roles = config_store.roles
 
         if not roles:
             return await interaction.response.send_message(
@@ -245,9 +354,10 @@ class Staff(commands.Cog):
     @app_commands.describe(канал="Текстовый канал, куда будут приходить готовые заявки.")
     @app_commands.checks.has_permissions(administrator=True)
     async def set_applications_channel(self, interaction: discord.Interaction, канал: discord.TextChannel):
-        config = load_config()
-        config['application_channel_id'] = канал.id
-        save_config(config)
+        try:
+            await config_store.set_application_channel(канал.id)
+        except OSError:
+            return await interaction.response.send_message("❌ Не удалось сохранить настройки.", ephemeral=True)
         await interaction.response.send_message(
             f"✅ Канал {канал.mention} успешно установлен для приема и проверки заявок.",
             ephemeral=True
@@ -262,26 +372,29 @@ class Staff(commands.Cog):
     @app_commands.checks.has_permissions(administrator=True)
     async def add_staff_role(self, interaction: discord.Interaction, название: str, значение: str,
                              роль: discord.Role = None):
-        config = load_config()
-        if any(r['value'] == значение for r in config['roles']):
+        if config_store.get_role(значение):
             return await interaction.response.send_message(f"❌ Ошибка: Значение '{значение}' уже используется.",
                                                            ephemeral=True)
 
         new_role = {"label": название, "value": значение, "role_id": роль.id if роль else None}
-        config['roles'].append(new_role)
-        save_config(config)
+        try:
+            added = await config_store.add_role(new_role)
+        except OSError:
+            return await interaction.response.send_message("❌ Не удалось сохранить настройки.", ephemeral=True)
+        if not added:
+            return await interaction.response.send_message(f"❌ Не удалось добавить должность '{название}'.",
+                                                           ephemeral=True)
         await interaction.response.send_message(f"✅ Должность '{название}' добавлена.", ephemeral=True)
 
     @app_commands.command(name="remove_staff_role", description="⭐ (Админ) Удалить должность из списка набора.")
     @app_commands.describe(значение="Уникальный ID должности для удаления.")
     @app_commands.checks.has_permissions(administrator=True)
     async def remove_staff_role(self, interaction: discord.Interaction, значение: str):
-        config = load_config()
-        initial_len = len(config['roles'])
-        config['roles'] = [r for r in config['roles'] if r['value'] != значение]
-
-        if len(config['roles']) < initial_len:
-            save_config(config)
+        try:
+            removed = await config_store.remove_role(значение)
+        except OSError:
+            return await interaction.response.send_message("❌ Не удалось сохранить настройки.", ephemeral=True)
+        if removed:
             await interaction.response.send_message(f"✅ Должность '{значение}' удалена.", ephemeral=True)
         else:
             await interaction.response.send_message(f"❌ Должность '{значение}' не найдена.", ephemeral=True)
@@ -289,10 +402,9 @@ class Staff(commands.Cog):
     @remove_staff_role.autocomplete('значение')
     async def remove_staff_role_autocomplete(self, _: discord.Interaction, current: str) -> list[
         app_commands.Choice[str]]:
-        config = load_config()
         choices = [
             app_commands.Choice(name=role['label'], value=role['value'])
-            for role in config.get('roles', [])
+            for role in config_store.roles
             if current.lower() in role['label'].lower() or current.lower() in role['value'].lower()
         ]
         return choices[:25]
@@ -0,0 +1,2 @@
+# Движок, сессии и Base общие для всех пакетов — см. database/engine.py
+from database.engine import engine, async_session, Base, get_session, create_tables
@@ -0,0 +1,32 @@
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert
+from .connection import get_session
+from .models import AIConversation
+
+
+class ConversationDatabase:
+    async def get_conversation(self, channel_id: int) -> AIConversation | None:
+        async with get_session() as session:
+            return await session.get(AIConversation, channel_id)
+
+    async def save_conversations(self, rows: list[dict]):
+        """Сохраняет пачку историй одним upsert. rows: channel_id, summary, history, updated_at."""
+        if not rows:
+            return
+        async with get_session() as session:
+            stmt = insert(AIConversation).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[AIConversation.channel_id],
+                set_={
+                    'summary': stmt.excluded.summary,
+                    'history': stmt.excluded.history,
+                    'updated_at': stmt.excluded.updated_at,
+                },
+            )
+            await session.execute(stmt)
+            await session.commit()
+
+    async def delete_conversation(self, channel_id: int):
+        async with get_session() as session:
+            await session.execute(delete(AIConversation).where(AIConversation.channel_id == channel_id))
+            await session.commit()
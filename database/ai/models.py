@@ -0,0 +1,14 @@
+import datetime
+from sqlalchemy import BigInteger, Text, DateTime
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+from .connection import Base
+
+class AIConversation(Base):
+    """Сохранённая история ИИ-чата канала: конспект и последние реплики."""
+    __tablename__ = 'ai_conversations'
+
+    channel_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    summary: Mapped[str] = mapped_column(Text, default='', server_default='')
+    history: Mapped[list] = mapped_column(JSONB, default=list, server_default='[]')
+    updated_at: Mapped[datetime.datetime] = mapped_column(DateTime, default=datetime.datetime.utcnow)
@@ -0,0 +1,40 @@
+from types import MappingProxyType
+from typing import Mapping, NamedTuple
+
+from .functions import Database
+from .models import Business
+
+
+class CatalogSnapshot(NamedTuple):
+    businesses: tuple[Business, ...]
+    by_id: Mapping[int, Business]
+    by_name: Mapping[str, Business]
+
+
+EMPTY_SNAPSHOT = CatalogSnapshot((), MappingProxyType({}), MappingProxyType({}))
+
+
+class BusinessCatalog:
+    """Каталог типов бизнеса в памяти. Меняется только админами, поэтому читается из БД лишь при перезагрузке."""
+
+    def __init__(self, db: Database):
+        self.db = db
+        self.snapshot = EMPTY_SNAPSHOT
+
+    async def load(self):
+        """Перечитывает каталог и подменяет снимок целиком — читатели видят либо старый, либо новый."""
+        businesses = tuple(sorted(await self.db.get_all_businesses(), key=lambda b: b.id))
+        self.snapshot = CatalogSnapshot(
+            businesses=businesses,
+            by_id=MappingProxyType({b.id: b for b in businesses}),
+            by_name=MappingProxyType({b.name: b for b in businesses}),
+        )
+
+    def all(self) -> tuple[Business, ...]:
+        return self.snapshot.businesses
+
+    def get(self, business_id: int) -> Business | None:
+        return self.snapshot.by_id.get(business_id)
+
+    def get_by_name(self, name: str) -> Business | None:
+        return self.snapshot.by_name.get(name)
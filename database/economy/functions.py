@@ -1,20 +1,54 @@
-from sqlalchemy import select, func, delete, exists, update
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, func, delete, exists, update, or_, literal, cast, BigInteger, DateTime
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import selectinload, aliased
 from .connection import get_session
 from .models import User, Business, UserBusiness
-from datetime import datetime
+from .ledger import ledger
+from datetime import datetime, timedelta
+
+STARTING_CASH = 500
+COOLDOWN_COLUMNS = ('last_daily', 'last_work', 'last_steal', 'last_collect')
+BALANCE_COLUMNS = ('cash', 'bank')
+
+# Business.income начисляется за каждый такой период владения
+INCOME_PERIOD = timedelta(hours=3)
+# Дольше этого несобранный доход не копится
+INCOME_ACCRUAL_CAP = timedelta(hours=24)
+
+
+def _income_rate(user_id: int):
+    """Суммарный доход всех бизнесов пользователя за INCOME_PERIOD (одним SUM ... JOIN)."""
+    return (
+        select(func.coalesce(func.sum(Business.income), 0))
+        .select_from(UserBusiness)
+        .join(Business, UserBusiness.business_id == Business.id)
+        .where(UserBusiness.user_id == user_id)
+        .scalar_subquery()
+    )
+
+
+def _accrued_income(user_id: int, now: datetime):
+    """Сколько дохода накопилось с last_collect. Пока часы не запущены (NULL) — ноль."""
+    elapsed = func.least(
+        func.extract('epoch', literal(now, DateTime) - User.last_collect),
+        INCOME_ACCRUAL_CAP.total_seconds(),
+    )
+    accrued = func.floor(_income_rate(user_id) * elapsed / INCOME_PERIOD.total_seconds())
+    return cast(func.coalesce(accrued, 0), BigInteger)
+
 
 class Database:
-    async def update_balance(self, user_id: int, cash_delta: int = 0, bank_delta: int = 0):
+    async def update_balance(self, user_id: int, cash_delta: int = 0, bank_delta: int = 0, kind: str = 'adjust'):
         async with get_session() as session:
             result = await session.execute(select(User).filter_by(user_id=user_id))
             user = result.scalar_one_or_none()
             if not user:
-                user = User(user_id=user_id, cash=500, bank=0)
+                user = User(user_id=user_id, cash=STARTING_CASH, bank=0)
                 session.add(user)
             user.cash += cash_delta
             user.bank += bank_delta
             await session.commit()
+        ledger.record(user_id, kind, cash_delta, bank_delta)
 
     async def get_user(self, user_id: int) -> User | None:
         async with get_session() as session:
@@ -34,12 +68,171 @@ class Database:
             await session.execute(stmt)
             await session.commit()
 
+    async def claim_reward(self, user_id: int, column: str, cooldown: timedelta,
+                           amount: int = 0) -> tuple[bool, timedelta | None]:
+        """Атомарно проверяет кулдаун, начисляет награду и ставит отметку времени.
+
+        Возвращает (True, None) при успехе или (False, оставшееся время), если кулдаун ещё идёт.
+        """
+        if column not in COOLDOWN_COLUMNS:
+            raise ValueError(f"Неизвестный кулдаун: {column}")
+        last_claim = getattr(User, column)
+        # Время берём из Python (UTC), как и везде в экономике, а не now() сервера
+        now = datetime.utcnow()
+
+        async with get_session() as session:
+            stmt = insert(User).values(user_id=user_id, cash=STARTING_CASH + amount, bank=0, **{column: now})
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[User.user_id],
+                set_={'cash': User.cash + amount, column: now},
+                where=or_(last_claim.is_(None), last_claim <= now - cooldown),
+            ).returning(User.cash)
+            claimed = (await session.execute(stmt)).scalar_one_or_none()
+            if claimed is not None:
+                await session.commit()
+                ledger.record(user_id, column.removeprefix('last_'), amount)
+                return True, None
+
+            last_time = await session.scalar(select(last_claim).where(User.user_id == user_id))
+            return False, (last_time + cooldown) - now
+
+    async def transfer(self, from_id: int | None, to_id: int | None, amount: int,
+                       from_account: str = 'cash', to_account: str = 'cash',
+                       credit_amount: int | None = None, kind: str = 'transfer') -> tuple[int | None, int | None] | None:
+        """Списывает amount у from_id и зачисляет credit_amount (по умолчанию amount) to_id в одной транзакции.
+
+        from_id=None — деньги выдаются «из воздуха», to_id=None — деньги изымаются из экономики.
+        Возвращает новые балансы (отправителя, получателя) или None, если у отправителя нет строки
+        или не хватает средств.
+        """
+        if from_account not in BALANCE_COLUMNS or to_account not in BALANCE_COLUMNS:
+            raise ValueError(f"Неизвестный счёт: {from_account} / {to_account}")
+        if credit_amount is None:
+            credit_amount = amount
+        user_ids = sorted({uid for uid in (from_id, to_id) if uid is not None})
+
+        async with get_session() as session:
+            # Строку создаём только получателю: у списываемой стороны её не должно появляться с
+            # начальными деньгами, иначе перевод с несуществующего id чеканит монеты
+            if to_id is not None and to_id != from_id:
+                await session.execute(
+                    insert(User)
+                    .values(user_id=to_id, cash=STARTING_CASH, bank=0)
+                    .on_conflict_do_nothing(index_elements=[User.user_id])
+                )
+            # Блокируем существующие строки по возрастанию user_id,
+            # чтобы встречные переводы A->B и B->A не ловили deadlock
+            await session.execute(
+                select(User.user_id).where(User.user_id.in_(user_ids)).order_by(User.user_id).with_for_update()
+            )
+
+            from_balance = to_balance = None
+            if from_id is not None:
+                column = getattr(User, from_account)
+                from_balance = await session.scalar(
+                    update(User)
+                    .where(User.user_id == from_id, column >= amount)
+                    .values({from_account: column - amount})
+                    .returning(column)
+                )
+                if from_balance is None:
+                    await session.rollback()
+                    return None
+
+            if to_id is not None:
+                column = getattr(User, to_account)
+                to_balance = await session.scalar(
+                    update(User)
+                    .where(User.user_id == to_id)
+                    .values({to_account: column + credit_amount})
+                    .returning(column)
+                )
+
+            await session.commit()
+
+        # Одна запись на каждого участника; перевод самому себе (банк <-> наличные) — одна запись
+        deltas = {uid: {'cash': 0, 'bank': 0} for uid in user_ids}
+        if from_id is not None:
+            deltas[from_id][from_account] -= amount
+        if to_id is not None:
+            deltas[to_id][to_account] += credit_amount
+        for uid, delta in deltas.items():
+            counterparty = to_id if uid == from_id else from_id
+            ledger.record(uid, kind, delta['cash'], delta['bank'],
+                          counterparty_id=counterparty if counterparty != uid else None)
+        return from_balance, to_balance
+
+    async def _settle_income(self, session, user_id: int, now: datetime, restart: bool = False) -> int | None:
+        """Зачисляет накопленный доход и перезапускает часы. Возвращает сумму или None, если нечего собирать.
+
+        restart=True — перед покупкой/продажей бизнеса: часы перезапускаются даже без дохода
+        (ставка могла быть нулевой), чтобы новая ставка не применялась задним числом.
+        """
+        accrued = (
+            select(User.user_id, _accrued_income(user_id, now).label('amount'))
+            .where(User.user_id == user_id)
+            .with_for_update()
+            .cte('accrued')
+        )
+        # Без restart часы не трогаем, пока не накопилось хотя бы на единицу: иначе дробный доход сгорал бы
+        condition = User.user_id == accrued.c.user_id
+        if not restart:
+            condition = condition & (accrued.c.amount > 0)
+        stmt = (
+            update(User)
+            .where(condition)
+            .values(cash=User.cash + accrued.c.amount, last_collect=now)
+            .returning(accrued.c.amount)
+            .execution_options(synchronize_session=False)
+        )
+        amount = await session.scalar(stmt)
+        if restart:
+            return amount or None
+        if amount is None:
+            # Ничего не накопилось: только запускаем часы, если они ещё не идут
+            await session.execute(
+                update(User)
+                .where(User.user_id == user_id, User.last_collect.is_(None))
+                .values(last_collect=now)
+                .execution_options(synchronize_session=False)
+            )
+        return amount
+
+    async def collect_income(self, user_id: int) -> int | None:
+        """Собирает накопленный доход с бизнесов одним UPDATE. None — собирать пока нечего."""
+        async with get_session() as session:
+            amount = await self._settle_income(session, user_id, datetime.utcnow())
+            await session.commit()
+        if amount:
+            ledger.record(user_id, 'income', amount)
+        return amount
+
+    async def get_pending_income(self, user_id: int) -> tuple[int, int]:
+        """Доход бизнесов пользователя за период и уже накопленная сумма — без загрузки самих бизнесов."""
+        async with get_session() as session:
+            query = select(_income_rate(user_id), _accrued_income(user_id, datetime.utcnow())).where(User.user_id == user_id)
+            row = (await session.execute(query)).first()
+            # Без строки в экономике бизнесов быть не может
+            return (row[0], row[1]) if row else (0, 0)
+
     async def get_top_users(self, limit: int = 10):
         async with get_session() as session:
             query = select(User).order_by((User.cash + User.bank).desc()).limit(limit)
             result = await session.execute(query)
             return result.scalars().all()
 
+    async def get_user_position(self, user_id: int) -> int | None:
+        """Место пользователя в топе по общему балансу или None, если его нет в экономике."""
+        other = aliased(User)
+        richer = (
+            select(func.count())
+            .select_from(other)
+            .where(other.cash + other.bank > User.cash + User.bank)
+            .scalar_subquery()
+        )
+        async with get_session() as session:
+            return await session.scalar(select(richer + 1).where(User.user_id == user_id))
+
     async def add_business(self, name: str, price: int, income: int, limit: int) -> bool:
         async with get_session() as session:
             query = select(exists().where(Business.name == name))
@@ -53,15 +246,15 @@ class Database:
 
     async def delete_business_type(self, business_id: int) -> str:
         async with get_session() as session:
-            business_to_delete = await session.get(Business, business_id)
-            if not business_to_delete:
-                return 'not_found'
-
-            owned_count = await self.count_owned_businesses(business_id)
-            if owned_count > 0:
-                return 'is_owned'
+            deleted = await session.scalar(
+                delete(Business)
+                .where(Business.id == business_id, Business.owned_count == 0)
+                .returning(Business.id)
+            )
+            if deleted is None:
+                business_exists = await session.scalar(select(exists().where(Business.id == business_id)))
+                return 'is_owned' if business_exists else 'not_found'
 
-            await session.delete(business_to_delete)
             await session.commit()
             return 'success'
 
@@ -74,17 +267,46 @@ class Database:
         async with get_session() as session:
             return await session.get(Business, business_id)
 
-    async def count_owned_businesses(self, business_id: int) -> int:
+    async def count_owned_by_type(self) -> dict[int, int]:
+        """Сколько бизнесов каждого типа уже куплено — по счётчикам owned_count."""
         async with get_session() as session:
-            query = select(func.count()).select_from(UserBusiness).filter_by(business_id=business_id)
-            result = await session.scalar(query)
-            return result or 0
+            result = await session.execute(select(Business.id, Business.owned_count))
+            return dict(result.all())
+
+    async def purchase_business(self, user_id: int, business_id: int) -> str:
+        """Покупка одной транзакцией: резерв по лимиту, списание денег и запись владения.
 
-    async def purchase_business(self, user_id: int, business_id: int):
+        Возвращает 'success', 'not_found', 'sold_out' или 'no_money'.
+        """
         async with get_session() as session:
-            user_business = UserBusiness(user_id=user_id, business_id=business_id)
-            session.add(user_business)
+            # Условный инкремент — при параллельных покупках лимит не будет превышен
+            price = await session.scalar(
+                update(Business)
+                .where(Business.id == business_id, Business.owned_count < Business.limit)
+                .values(owned_count=Business.owned_count + 1)
+                .returning(Business.price)
+            )
+            if price is None:
+                business_exists = await session.scalar(select(exists().where(Business.id == business_id)))
+                return 'sold_out' if business_exists else 'not_found'
+
+            income = await self._settle_income(session, user_id, datetime.utcnow(), restart=True)
+            paid = await session.scalar(
+                update(User)
+                .where(User.user_id == user_id, User.cash >= price)
+                .values(cash=User.cash - price)
+                .returning(User.cash)
+            )
+            if paid is None:
+                await session.rollback()
+                return 'no_money'
+
+            session.add(UserBusiness(user_id=user_id, business_id=business_id))
             await session.commit()
+        if income:
+            ledger.record(user_id, 'income', income)
+        ledger.record(user_id, 'business_buy', -price)
+        return 'success'
 
     async def get_user_businesses(self, user_id: int):
         async with get_session() as session:
@@ -96,6 +318,24 @@ class Database:
             result = await session.execute(query)
             return result.scalars().all()
 
+    async def get_user_business_ids(self, user_id: int) -> list[tuple[int, int]]:
+        """Бизнесы пользователя как (id владения, id типа) — детали берутся из каталога в памяти."""
+        async with get_session() as session:
+            query = (
+                select(UserBusiness.id, UserBusiness.business_id)
+                .filter_by(user_id=user_id)
+                .order_by(UserBusiness.id)
+            )
+            result = await session.execute(query)
+            return [tuple(row) for row in result.all()]
+
+    async def get_user_business_row(self, user_business_id: int) -> tuple[int, int] | None:
+        """Владелец и тип бизнеса по id владения как (user_id, business_id)."""
+        async with get_session() as session:
+            query = select(UserBusiness.user_id, UserBusiness.business_id).where(UserBusiness.id == user_business_id)
+            row = (await session.execute(query)).first()
+            return tuple(row) if row else None
+
     async def get_user_business_by_id(self, user_business_id: int) -> UserBusiness | None:
         async with get_session() as session:
             query = (
@@ -106,7 +346,35 @@ class Database:
             result = await session.execute(query)
             return result.scalar_one_or_none()
 
-    async def sell_business(self, user_business_id: int):
+    async def sell_business(self, user_id: int, user_business_id: int, refund: int) -> bool:
+        """Продажа одной транзакцией: освобождает место в лимите, удаляет владение и зачисляет выручку."""
         async with get_session() as session:
-            await session.execute(delete(UserBusiness).where(UserBusiness.id == user_business_id))
-            await session.commit()
\ No newline at end of file
+            business_id = await session.scalar(
+                select(UserBusiness.business_id)
+                .where(UserBusiness.id == user_business_id, UserBusiness.user_id == user_id)
+            )
+            if business_id is None:
+                return False
+
+            # Блокировки в том же порядке, что и при покупке: тип бизнеса, затем пользователь
+            await session.execute(
+                update(Business)
+                .where(Business.id == business_id)
+                .values(owned_count=func.greatest(Business.owned_count - 1, 0))
+            )
+            income = await self._settle_income(session, user_id, datetime.utcnow(), restart=True)
+            deleted = await session.scalar(
+                delete(UserBusiness)
+                .where(UserBusiness.id == user_business_id, UserBusiness.user_id == user_id)
+                .returning(UserBusiness.id)
+            )
+            if deleted is None:
+                await session.rollback()
+                return False
+
+            await session.execute(update(User).where(User.user_id == user_id).values(cash=User.cash + refund))
+            await session.commit()
+        if income:
+            ledger.record(user_id, 'income', income)
+        ledger.record(user_id, 'business_sell', refund)
+        return True
\ No newline at end of file
@@ -0,0 +1,64 @@
+import asyncio
+import logging
+import time
+from contextlib import suppress
+
+from .functions import Database
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+
+class Leaderboard:
+    """Снимок топа богачей в памяти. Обновляется по таймеру или после заметного числа изменений балансов."""
+
+    def __init__(self, db: Database, size: int = 10, refresh_interval: float = 60.0, writes_threshold: int = 20):
+        self.db = db
+        self.size = size
+        self.refresh_interval = refresh_interval
+        self.writes_threshold = writes_threshold
+        self.entries: tuple[User, ...] = ()
+        self.refreshed_at = 0.0
+
+        self._writes = 0
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self._pending_refresh: asyncio.Task | None = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        for task in (self._task, self._pending_refresh):
+            if task and not task.done():
+                task.cancel()
+                with suppress(asyncio.CancelledError):
+                    await task
+        self._task = None
+
+    def top(self, limit: int | None = None) -> tuple[User, ...]:
+        return self.entries[:limit] if limit else self.entries
+
+    def note_write(self, count: int = 1):
+        """Отмечает изменение балансов. После writes_threshold изменений снимок обновится вне очереди."""
+        self._writes += count
+        if self._writes >= self.writes_threshold and (self._pending_refresh is None or self._pending_refresh.done()):
+            self._pending_refresh = asyncio.create_task(self.refresh())
+
+    async def refresh(self):
+        async with self._lock:
+            writes = self._writes
+            try:
+                users = await self.db.get_top_users(self.size)
+            except Exception:
+                logger.exception("Не удалось обновить топ богачей")
+                return
+            self.entries = tuple(users)
+            self.refreshed_at = time.monotonic()
+            self._writes -= writes
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await self.refresh()
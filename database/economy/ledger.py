@@ -0,0 +1,105 @@
+import asyncio
+import logging
+from contextlib import suppress
+from datetime import datetime
+
+from sqlalchemy import insert, select
+
+from .connection import get_session
+from .models import LedgerEntry
+
+logger = logging.getLogger(__name__)
+
+# Строк в одном INSERT: накопленный за время сбоя хвост уходит частями, а не одним огромным запросом
+LEDGER_BATCH_SIZE = 500
+# Дольше этого буфер при недоступной БД не растёт: самые старые записи отбрасываются с предупреждением
+LEDGER_MAX_BACKLOG = 20_000
+
+
+class LedgerWriter:
+    """Буфер журнала операций: записи копятся в памяти и вставляются пачками по таймеру или по размеру."""
+
+    def __init__(self, flush_interval: float = 2.0, max_pending: int = 200, batch_size: int = LEDGER_BATCH_SIZE,
+                 max_backlog: int = LEDGER_MAX_BACKLOG):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.max_backlog = max_backlog
+        self.pending: list[dict] = []
+        self.dropped = 0
+
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self._size_flush: asyncio.Task | None = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        await self.flush()
+
+    def record(self, user_id: int, kind: str, delta_cash: int = 0, delta_bank: int = 0,
+               counterparty_id: int | None = None):
+        if not delta_cash and not delta_bank:
+            return
+        self.pending.append({
+            'user_id': user_id,
+            'counterparty_id': counterparty_id,
+            'kind': kind,
+            'delta_cash': delta_cash,
+            'delta_bank': delta_bank,
+            'created_at': datetime.utcnow(),
+        })
+        self._trim()
+        if len(self.pending) >= self.max_pending and (self._size_flush is None or self._size_flush.done()):
+            self._size_flush = asyncio.create_task(self.flush())
+
+    def _trim(self):
+        overflow = len(self.pending) - self.max_backlog
+        if overflow > 0:
+            del self.pending[:overflow]
+            self.dropped += overflow
+            logger.warning(f"Журнал операций переполнен, отброшено {overflow} старых записей "
+                           f"(всего {self.dropped})")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self):
+        async with self._lock:
+            if not self.pending:
+                return
+            rows, self.pending = self.pending, []
+            for start in range(0, len(rows), self.batch_size):
+                try:
+                    async with get_session() as session:
+                        await session.execute(insert(LedgerEntry), rows[start:start + self.batch_size])
+                        await session.commit()
+                except Exception:
+                    # Первая же неудачная часть останавливает сброс: остальные всё равно не пройдут
+                    logger.exception(f"Не удалось записать {len(rows) - start} операций в журнал, повторим позже")
+                    self.pending[:0] = rows[start:]
+                    self._trim()
+                    return
+
+    async def get_page(self, user_id: int, before_id: int | None = None, limit: int = 10) -> list[LedgerEntry]:
+        """Страница истории пользователя от новых к старым, начиная с записей старше before_id."""
+        await self.flush()
+        async with get_session() as session:
+            query = select(LedgerEntry).where(LedgerEntry.user_id == user_id)
+            if before_id is not None:
+                query = query.where(LedgerEntry.id < before_id)
+            result = await session.execute(query.order_by(LedgerEntry.id.desc()).limit(limit))
+            return result.scalars().all()
+
+
+# Общий журнал для всех экземпляров Database
+ledger = LedgerWriter()
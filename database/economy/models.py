@@ -1,6 +1,7 @@
-from sqlalchemy import BigInteger, String, ForeignKey, Integer, DateTime
+from datetime import datetime
+from sqlalchemy import BigInteger, String, ForeignKey, Integer, DateTime, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from .connection import Base
+from .connection import Base, register_schema_upgrade
 
 class User(Base):
     __tablename__ = 'economy_users'
@@ -20,6 +21,9 @@ class User(Base):
     def total(self) -> int:
         return self.cash + self.bank
 
+# Индекс по общему балансу для топа и поиска места пользователя
+Index('ix_economy_users_total', User.cash + User.bank)
+
 class Business(Base):
     __tablename__ = 'businesses'
 
@@ -28,6 +32,8 @@ class Business(Base):
     price: Mapped[int] = mapped_column(BigInteger)
     income: Mapped[int] = mapped_column(BigInteger)
     limit: Mapped[int] = mapped_column(Integer, default=1)
+    # Сколько бизнесов этого типа сейчас куплено. Меняется только вместе с user_businesses.
+    owned_count: Mapped[int] = mapped_column(Integer, default=0, server_default='0', nullable=False)
 
 class UserBusiness(Base):
     __tablename__ = 'user_businesses'
@@ -37,4 +43,25 @@ class UserBusiness(Base):
     business_id: Mapped[int] = mapped_column(Integer, ForeignKey('businesses.id'))
 
     owner: Mapped["User"] = relationship(back_populates="businesses")
-    business_info: Mapped["Business"] = relationship()
\ No newline at end of file
+    business_info: Mapped["Business"] = relationship()
+
+class LedgerEntry(Base):
+    """Запись журнала движения денег. Только добавляется, никогда не меняется."""
+    __tablename__ = 'economy_ledger'
+    # Keyset-пагинация истории: WHERE user_id = ? AND id < ? ORDER BY id DESC
+    __table_args__ = (Index('ix_economy_ledger_user_id_id', 'user_id', 'id'),)
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    user_id: Mapped[int] = mapped_column(BigInteger)
+    counterparty_id: Mapped[int] = mapped_column(BigInteger, nullable=True)
+    kind: Mapped[str] = mapped_column(String(32))
+    delta_cash: Mapped[int] = mapped_column(BigInteger, default=0)
+    delta_bank: Mapped[int] = mapped_column(BigInteger, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+register_schema_upgrade(
+    "ALTER TABLE businesses ADD COLUMN IF NOT EXISTS owned_count INTEGER NOT NULL DEFAULT 0",
+    # Сверяем счётчики с фактическими владениями при каждом запуске
+    "UPDATE businesses b SET owned_count = "
+    "(SELECT count(*) FROM user_businesses ub WHERE ub.business_id = b.id)",
+)
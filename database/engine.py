@@ -0,0 +1,107 @@
+import asyncio
+import importlib
+import os
+from contextlib import asynccontextmanager
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncAttrs
+from sqlalchemy.orm import DeclarativeBase
+
+# --- НАСТРОЙКА ---
+POSTGRES_DB = os.getenv("POSTGRES_DB")
+POSTGRES_USER = os.getenv("POSTGRES_USER")
+POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD")
+DATABASE_URL = os.getenv(
+    "DATABASE_URL",
+    f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@db:5432/{POSTGRES_DB}"
+)
+
+# --- ПУЛ СОЕДИНЕНИЙ ---
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# Кэш подготовленных выражений asyncpg. Поставьте 0, если БД стоит за pgbouncer в режиме transaction.
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+
+# Модули с моделями. Импортируются перед create_all, чтобы в метаданных были все таблицы.
+MODEL_MODULES = (
+    "database.ai.models",
+    "database.economy.models",
+    "database.rank.models",
+    "database.suggest.models",
+    "database.warn.models",
+)
+# -----------------
+
+# Один движок и один пул соединений на весь процесс
+engine = create_async_engine(
+    DATABASE_URL,
+    echo=False,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING,
+    connect_args={
+        "statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+        "prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+    },
+)
+
+async_session = async_sessionmaker(engine, expire_on_commit=False)
+
+
+# Идемпотентные SQL-выражения для уже существующих таблиц (новые колонки, пересчёт счётчиков).
+# Выполняются по порядку после create_all.
+SCHEMA_UPGRADES: list[str] = []
+
+
+# Общий базовый класс: все модели регистрируются в одном Base.metadata
+class Base(AsyncAttrs, DeclarativeBase):
+    pass
+
+
+def register_schema_upgrade(*statements: str):
+    """Регистрирует SQL, который нужно выполнять при каждом создании схемы."""
+    SCHEMA_UPGRADES.extend(statements)
+
+
+@asynccontextmanager
+async def get_session():
+    """Асинхронный менеджер контекста для получения сессии из общего пула."""
+    async with async_session() as session:
+        yield session
+
+
+def _create_missing_indexes(sync_conn):
+    # create_all строит индексы только вместе с новой таблицей, а на уже существующих их нужно досоздать
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+
+async def create_tables():
+    """Создает все таблицы и индексы всех пакетов в базе данных, если их еще нет."""
+    for module in MODEL_MODULES:
+        importlib.import_module(module)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        for statement in SCHEMA_UPGRADES:
+            await conn.execute(text(statement))
+        await conn.run_sync(_create_missing_indexes)
+
+
+async def warm_up_pool(size: int = DB_POOL_SIZE):
+    """Заранее открывает соединения пула, чтобы первые команды не ждали подключения к БД."""
+    async def ping():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    await asyncio.gather(*(ping() for _ in range(size)))
+
+
+async def dispose_engine():
+    """Закрывает все соединения пула."""
+    await engine.dispose()
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from contextlib import suppress
+from typing import Any, Awaitable, Callable
+
+from .functions import RankDatabase
+from .models import RankUser
+
+logger = logging.getLogger(__name__)
+
+# (пользователь после начисления, уровень до начисления, контекст из add())
+LevelUpCallback = Callable[[RankUser, int, Any], Awaitable[None]]
+# Все строки, изменённые сбросом
+FlushCallback = Callable[[list[RankUser]], None]
+
+
+class XPBuffer:
+    """Копит опыт в памяти и сбрасывает его в БД одной пачкой по таймеру или по размеру буфера."""
+
+    def __init__(self, db: RankDatabase, on_level_up: LevelUpCallback, on_flush: FlushCallback | None = None,
+                 flush_interval: float = 10.0, max_pending: int = 500):
+        self.db = db
+        self.on_level_up = on_level_up
+        self.on_flush = on_flush
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.pending: defaultdict[int, int] = defaultdict(int)
+        self.contexts: dict[int, Any] = {}
+
+        # Метрики сброса
+        self.flush_count = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self._size_flush: asyncio.Task | None = None
+
+    @property
+    def avg_flush_ms(self) -> float:
+        return self.total_flush_ms / self.flush_count if self.flush_count else 0.0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        await self.flush()
+
+    def add(self, user_id: int, xp: int, context: Any = None):
+        self.pending[user_id] += xp
+        if context is not None:
+            self.contexts[user_id] = context
+        if len(self.pending) >= self.max_pending and (self._size_flush is None or self._size_flush.done()):
+            self._size_flush = asyncio.create_task(self.flush())
+
+    def pending_xp(self, user_id: int) -> int:
+        return self.pending.get(user_id, 0)
+
+    def discard(self, user_id: int):
+        """Забывает ещё не сброшенный опыт (например, когда админ выставил значения вручную)."""
+        self.pending.pop(user_id, None)
+        self.contexts.pop(user_id, None)
+
+    async def overwrite(self, user_id: int, write: Callable[[], Awaitable[RankUser]]) -> RankUser:
+        """Ручная запись опыта или уровня под замком сброса.
+
+        Идущий сброс успевает записать свою пачку раньше, накопленный опыт пользователя забывается,
+        и ни один сброс не ляжет поверх значения администратора.
+        """
+        async with self._lock:
+            self.discard(user_id)
+            return await write()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self):
+        async with self._lock:
+            if not self.pending:
+                return
+            deltas, self.pending = dict(self.pending), defaultdict(int)
+            contexts, self.contexts = self.contexts, {}
+
+            started = time.perf_counter()
+            try:
+                results = await self.db.add_xp_bulk(deltas)
+            except Exception:
+                logger.exception(f"Не удалось сбросить опыт для {len(deltas)} пользователей, повторим позже")
+                for user_id, xp in deltas.items():
+                    self.pending[user_id] += xp
+                for user_id, context in contexts.items():
+                    self.contexts.setdefault(user_id, context)
+                return
+
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.flush_count += 1
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self.total_flush_ms += elapsed_ms
+            logger.debug(f"XP flush: {len(deltas)} пользователей за {elapsed_ms:.1f} мс "
+                         f"(среднее {self.avg_flush_ms:.1f} мс, максимум {self.max_flush_ms:.1f} мс)")
+            if elapsed_ms > 1000:
+                logger.warning(f"Медленный сброс опыта: {elapsed_ms:.0f} мс для {len(deltas)} пользователей")
+
+            if self.on_flush:
+                self.on_flush([user for user, _ in results])
+
+        for user, old_level in results:
+            if user.level > old_level:
+                try:
+                    await self.on_level_up(user, old_level, contexts.get(user.user_id))
+                except Exception:
+                    logger.exception(f"Ошибка при объявлении нового уровня для {user.user_id}")
@@ -1,8 +1,17 @@
-from sqlalchemy import select, delete
+from sqlalchemy import select, delete, update, func
+from sqlalchemy.dialects.postgresql import insert
 from .connection import get_session
 from .models import RankUser, NoXPChannel
 
 
+def apply_level_ups(level: int, xp: int) -> tuple[int, int]:
+    """Переводит накопленный опыт в уровни. За один вызов можно получить несколько уровней."""
+    while xp >= (level + 1) * 100:
+        xp -= (level + 1) * 100
+        level += 1
+    return level, xp
+
+
 class RankDatabase:
     async def get_user(self, user_id: int) -> RankUser | None:
         async with get_session() as session:
@@ -22,21 +31,48 @@ class RankDatabase:
             if user.level is None:
                 user.level = 0
 
-            user.xp += xp_to_add
-
-            leveled_up = False
-            xp_needed = (user.level + 1) * 100
-
-            if user.xp >= xp_needed:
-                user.level += 1
-                user.xp -= xp_needed
-                leveled_up = True
+            old_level = user.level
+            user.level, user.xp = apply_level_ups(user.level, user.xp + xp_to_add)
+            leveled_up = user.level > old_level
 
             await session.commit()
             await session.refresh(user)
 
             return user, leveled_up
 
+    async def add_xp_bulk(self, deltas: dict[int, int]) -> list[tuple[RankUser, int]]:
+        """Начисляет накопленный опыт пачкой: один upsert и одно обновление уровней.
+
+        Возвращает пары (пользователь после начисления, уровень до начисления).
+        """
+        if not deltas:
+            return []
+
+        async with get_session() as session:
+            # Сортировка по user_id — строки блокируются в одном порядке и параллельные сбросы не ловят deadlock
+            stmt = insert(RankUser).values(
+                [{"user_id": user_id, "level": 0, "xp": xp} for user_id, xp in sorted(deltas.items())]
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[RankUser.user_id],
+                set_={"xp": func.coalesce(RankUser.xp, 0) + stmt.excluded.xp},
+            ).returning(RankUser.user_id, RankUser.level, RankUser.xp)
+            rows = (await session.execute(stmt)).all()
+
+            results = []
+            level_updates = []
+            for user_id, level, xp in rows:
+                old_level = level or 0
+                new_level, new_xp = apply_level_ups(old_level, xp)
+                if new_level != old_level:
+                    level_updates.append({"user_id": user_id, "level": new_level, "xp": new_xp})
+                results.append((RankUser(user_id=user_id, level=new_level, xp=new_xp), old_level))
+
+            if level_updates:
+                await session.execute(update(RankUser), level_updates)
+            await session.commit()
+            return results
+
     async def set_user_rank(self, user_id: int, level: int | None = None, xp: int | None = None) -> RankUser:
         async with get_session() as session:
             result = await session.execute(select(RankUser).filter_by(user_id=user_id))
@@ -60,6 +96,13 @@ class RankDatabase:
             result = await session.execute(query)
             return result.scalars().all()
 
+    async def get_all_ranks(self) -> list[tuple[int, int, int]]:
+        """Все пользователи как (user_id, level, xp) — для построения индекса в памяти."""
+        async with get_session() as session:
+            query = select(RankUser.user_id, func.coalesce(RankUser.level, 0), func.coalesce(RankUser.xp, 0))
+            result = await session.execute(query)
+            return [tuple(row) for row in result.all()]
+
     async def get_no_xp_channels(self) -> set[int]:
         async with get_session() as session:
             query = select(NoXPChannel.channel_id)
@@ -0,0 +1,44 @@
+from typing import Iterable
+
+from sortedcontainers import SortedList
+
+
+class RankIndex:
+    """Упорядоченный индекс пользователей в памяти: топ-K и место пользователя за O(log n)."""
+
+    def __init__(self):
+        # Ключ (-level, -xp, user_id): по возрастанию ключа идут сверху вниз по таблице лидеров
+        self._entries = SortedList()
+        self._keys: dict[int, tuple[int, int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def load(self, rows: Iterable[tuple[int, int, int]]):
+        """Полностью перестраивает индекс из строк (user_id, level, xp)."""
+        self._keys = {user_id: (-level, -xp, user_id) for user_id, level, xp in rows}
+        self._entries = SortedList(self._keys.values())
+
+    def update(self, user_id: int, level: int, xp: int):
+        old_key = self._keys.get(user_id)
+        new_key = (-level, -xp, user_id)
+        if old_key == new_key:
+            return
+        if old_key is not None:
+            self._entries.remove(old_key)
+        self._entries.add(new_key)
+        self._keys[user_id] = new_key
+
+    def remove(self, user_id: int):
+        key = self._keys.pop(user_id, None)
+        if key is not None:
+            self._entries.remove(key)
+
+    def position(self, user_id: int) -> int | None:
+        """Место пользователя (с единицы) или None, если его нет в индексе."""
+        key = self._keys.get(user_id)
+        return self._entries.index(key) + 1 if key is not None else None
+
+    def page(self, offset: int, limit: int) -> list[tuple[int, int, int]]:
+        """Срез таблицы лидеров как (user_id, level, xp)."""
+        return [(user_id, -level, -xp) for level, xp, user_id in self._entries.islice(offset, offset + limit)]
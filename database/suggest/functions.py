@@ -0,0 +1,73 @@
+from sqlalchemy import select, update, delete
+from sqlalchemy.dialects.postgresql import insert
+from .connection import get_session
+from .models import Suggestion, SuggestionVote
+
+
+class SuggestDatabase:
+    async def create_suggestion(self, message_id: int, channel_id: int, author_id: int, text: str) -> Suggestion:
+        async with get_session() as session:
+            suggestion = Suggestion(message_id=message_id, channel_id=channel_id, author_id=author_id, text=text,
+                                    status='pending', upvotes=0, downvotes=0)
+            session.add(suggestion)
+            await session.commit()
+            return suggestion
+
+    async def get_suggestion(self, message_id: int) -> Suggestion | None:
+        async with get_session() as session:
+            return await session.get(Suggestion, message_id)
+
+    async def set_status(self, message_id: int, status: str) -> Suggestion | None:
+        async with get_session() as session:
+            result = await session.execute(
+                update(Suggestion)
+                .where(Suggestion.message_id == message_id)
+                .values(status=status)
+                .returning(Suggestion)
+            )
+            suggestion = result.scalar_one_or_none()
+            await session.commit()
+            return suggestion
+
+    async def toggle_vote(self, message_id: int, user_id: int, value: int) -> tuple[int, int] | None:
+        """Повторный голос тем же знаком снимает его, противоположный — переключает.
+
+        Возвращает новые (за, против) или None, если предложения нет.
+        """
+        async with get_session() as session:
+            # Блокируем строку предложения: строки голоса может ещё не быть, и FOR UPDATE по ней
+            # ничего бы не заблокировал — параллельные голоса одного пользователя задвоили бы счётчик
+            found = await session.scalar(
+                select(Suggestion.message_id).where(Suggestion.message_id == message_id).with_for_update()
+            )
+            if found is None:
+                return None
+
+            old = await session.scalar(
+                select(SuggestionVote.value)
+                .where(SuggestionVote.message_id == message_id, SuggestionVote.user_id == user_id)
+            ) or 0
+            new = 0 if old == value else value
+            # Дельты считаем в Python: bool в выражении ушёл бы в Postgres как BOOLEAN, а integer + boolean нет
+            up_delta = int(new == 1) - int(old == 1)
+            down_delta = int(new == -1) - int(old == -1)
+
+            counts = (await session.execute(
+                update(Suggestion)
+                .where(Suggestion.message_id == message_id)
+                .values(upvotes=Suggestion.upvotes + up_delta, downvotes=Suggestion.downvotes + down_delta)
+                .returning(Suggestion.upvotes, Suggestion.downvotes)
+            )).one()
+
+            if new:
+                stmt = insert(SuggestionVote).values(message_id=message_id, user_id=user_id, value=new)
+                await session.execute(stmt.on_conflict_do_update(
+                    index_elements=[SuggestionVote.message_id, SuggestionVote.user_id],
+                    set_={'value': stmt.excluded.value},
+                ))
+            else:
+                await session.execute(delete(SuggestionVote).where(
+                    SuggestionVote.message_id == message_id, SuggestionVote.user_id == user_id))
+
+            await session.commit()
+            return counts.upvotes, counts.downvotes
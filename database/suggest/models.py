@@ -0,0 +1,26 @@
+from datetime import datetime
+from sqlalchemy import BigInteger, Text, String, Integer, SmallInteger, DateTime, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column
+from .connection import Base
+
+class Suggestion(Base):
+    __tablename__ = 'suggestions'
+
+    message_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    channel_id: Mapped[int] = mapped_column(BigInteger)
+    author_id: Mapped[int] = mapped_column(BigInteger)
+    text: Mapped[str] = mapped_column(Text)
+    status: Mapped[str] = mapped_column(String(16), default='pending', server_default='pending')
+    # Счётчики голосов; меняются только вместе с suggestion_votes
+    upvotes: Mapped[int] = mapped_column(Integer, default=0, server_default='0')
+    downvotes: Mapped[int] = mapped_column(Integer, default=0, server_default='0')
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+class SuggestionVote(Base):
+    """Один голос пользователя: +1 за, -1 против. Снятый голос удаляется."""
+    __tablename__ = 'suggestion_votes'
+
+    message_id: Mapped[int] = mapped_column(BigInteger, ForeignKey('suggestions.message_id', ondelete='CASCADE'),
+                                            primary_key=True)
+    user_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    value: Mapped[int] = mapped_column(SmallInteger)
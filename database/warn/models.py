@@ -1,9 +1,7 @@
 import datetime
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy import BigInteger, Text, DateTime
-
-class Base(DeclarativeBase):
-    pass
+from database.warn.connection import Base
 
 class Warn(Base):
     __tablename__ = 'warns'
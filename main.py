@@ -1,14 +1,24 @@
 import asyncio
+import hashlib
+import json
 import logging
 import os
+import sys
+import time
 
 import discord
 from discord.ext import commands
 
+from database.engine import create_tables, warm_up_pool, dispose_engine
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 logging.getLogger('discord').setLevel(logging.ERROR)
 
+# Отпечаток последнего синхронизированного дерева команд: sync дорогой и под жёстким лимитом
+COMMAND_TREE_HASH_FILE = os.getenv("COMMAND_TREE_HASH_FILE", "command_tree.hash")
+FORCE_SYNC = "--force-sync" in sys.argv or os.getenv("FORCE_SYNC", "").lower() in ("1", "true", "yes")
+
 class IlluminatBot(commands.Bot):
     def __init__(self):
         super().__init__(
@@ -16,23 +26,97 @@ class IlluminatBot(commands.Bot):
             help_command=None,
             intents=discord.Intents.all()
         )
+        self.started_at = time.perf_counter()
+        self.ready_logged = False
+        # Замеры старта по расширениям: модуль -> секунды
+        self.extension_started: dict[str, float] = {}
+        self.import_times: dict[str, float] = {}
+        self.init_times: dict[str, float] = {}
+
+    async def add_cog(self, cog: commands.Cog, **kwargs):
+        # Импорт модуля и конструктор кога идут синхронно до первого await, поэтому всё от начала
+        # load_extension до add_cog — время импорта, а сам add_cog (с cog_load) — время инициализации
+        module = type(cog).__module__
+        started = time.perf_counter()
+        if module in self.extension_started:
+            self.import_times[module] = started - self.extension_started[module]
+        await super().add_cog(cog, **kwargs)
+        self.init_times[module] = time.perf_counter() - started
+
+    async def load_extension_timed(self, name: str):
+        self.extension_started[name] = time.perf_counter()
+        await self.load_extension(name)
 
     async def load_cogs(self):
-        for folder in os.listdir("./cogs"):
-            if os.path.isdir(f"./cogs/{folder}"):
-                for file in os.listdir(f"./cogs/{folder}/"):
-                    if file.endswith(".py") and not file.startswith("_"):
-                        await self.load_extension(f"cogs.{folder}.{file[:-3]}")
+        # Коги друг от друга не зависят, их cog_load (БД, кэши) идут параллельно
+        extensions = [
+            f"cogs.{folder}.{file[:-3]}"
+            for folder in sorted(os.listdir("./cogs")) if os.path.isdir(f"./cogs/{folder}")
+            for file in sorted(os.listdir(f"./cogs/{folder}/")) if file.endswith(".py") and not file.startswith("_")
+        ]
+        await asyncio.gather(*(self.load_extension_timed(name) for name in extensions))
+        logger.info(f"Loaded {len(extensions)} extensions:")
+        for name in extensions:
+            logger.info(f"  {name}: import {self.import_times.get(name, 0):.2f}s, "
+                        f"init {self.init_times.get(name, 0):.2f}s")
+
+    def command_tree_hash(self) -> str:
+        """Хэш того, что sync отправит в Discord: имена, опции, локализации, права."""
+        payload = sorted(
+            (command.to_dict(self.tree) for command in self.tree.get_commands()),
+            key=lambda command: (command.get("type", 1), command["name"]),
+        )
+        data = json.dumps({"application_id": self.application_id, "commands": payload},
+                          sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    async def sync_commands(self):
+        fingerprint = self.command_tree_hash()
+        try:
+            with open(COMMAND_TREE_HASH_FILE, "r", encoding="utf-8") as f:
+                previous = f.read().strip()
+        except FileNotFoundError:
+            previous = None
+
+        if fingerprint == previous and not FORCE_SYNC:
+            logger.info(f"Command tree unchanged ({fingerprint[:12]}), sync skipped")
+            return
+
+        synced = await self.tree.sync()
+        with open(COMMAND_TREE_HASH_FILE, "w", encoding="utf-8") as f:
+            f.write(fingerprint)
+        logger.info(f"Synced {len(synced)} commands ({fingerprint[:12]}{', forced' if FORCE_SYNC else ''})")
 
     async def setup_hook(self):
         guild_id = int(os.getenv("DISCORD_GUILD"))
+        timings = {}
+
+        # Схема всех пакетов создаётся один раз здесь, а не в cog_load каждого кога
+        started = time.perf_counter()
+        await asyncio.gather(warm_up_pool(), create_tables())
+        timings["db pool + schema"] = time.perf_counter() - started
+
+        started = time.perf_counter()
         await self.load_cogs()
+        timings["cogs"] = time.perf_counter() - started
 
+        started = time.perf_counter()
         if guild_id:
             guild = discord.Object(id=guild_id)
             self.tree.copy_global_to(guild=guild)
-        synced = await self.tree.sync()
-        logger.info(f"Synced {len(synced)} commands!")
+        await self.sync_commands()
+        timings["command sync"] = time.perf_counter() - started
+
+        logger.info("Startup phases: " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in timings.items()))
+
+    async def on_ready(self):
+        if not self.ready_logged:
+            self.ready_logged = True
+            logger.info(f"Ready in {time.perf_counter() - self.started_at:.2f}s")
+
+    async def close(self):
+        await super().close()
+        await dispose_engine()
 
     async def on_command_error(self, ctx, error):
         if isinstance(error, commands.CommandNotFound):
@@ -0,0 +1,71 @@
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("httpx")
+
+from cogs.ai._providers import Provider, ProviderError, ProviderPool, ThrottledOut  # noqa: E402
+from cogs.ai._resilience import CircuitBreaker, RetryBudget  # noqa: E402
+
+
+def half_open_provider() -> Provider:
+    provider = Provider("test", "http://127.0.0.1:1/v1", "key", "model", breaker_threshold=1, breaker_reset=10.0)
+    provider.breaker.record_failure()
+    # Пора пробовать: следующий allow() переведёт предохранитель в полуоткрытое состояние
+    provider.breaker.opened_at = time.monotonic() - provider.breaker.reset_timeout
+    return provider
+
+
+async def hang(*args, **kwargs):
+    await asyncio.sleep(3600)
+
+
+def test_release_returns_probe_slot():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+    breaker.record_failure()
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+
+@pytest.mark.parametrize("stage", ["request", "throttle"])
+def test_cancelled_probe_is_released(stage):
+    async def scenario():
+        provider = half_open_provider()
+        provider.complete = hang
+        pool = ProviderPool([provider], hedging=False)
+        throttle = hang if stage == "throttle" else None
+
+        task = asyncio.create_task(pool.complete(None, [], "", RetryBudget(60.0), 1.0, throttle=throttle))
+        await asyncio.sleep(0.01)
+        assert provider.breaker.state == CircuitBreaker.HALF_OPEN
+        assert not provider.breaker.allow()  # слот пробы занят
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await asyncio.sleep(0)
+        assert provider.breaker.allow()
+
+    asyncio.run(scenario())
+
+
+def test_throttle_eating_the_budget_is_not_a_provider_failure():
+    async def scenario():
+        provider = Provider("test", "http://127.0.0.1:1/v1", "key", "model", breaker_threshold=1)
+        provider.complete = hang
+        pool = ProviderPool([provider], hedging=False)
+        budget = RetryBudget(60.0)
+
+        async def throttle():
+            budget.expires = time.monotonic() + budget.min_attempt_time / 2
+
+        with pytest.raises(ProviderError) as info:
+            await pool.complete(None, [], "", budget, 1.0, throttle=throttle)
+        assert isinstance(info.value.last, ThrottledOut)
+        assert not info.value.retryable
+        assert provider.breaker.state == CircuitBreaker.CLOSED
+        assert provider.requests == 0
+
+    asyncio.run(scenario())
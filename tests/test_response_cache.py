@@ -0,0 +1,30 @@
+from cogs.ai._cache import ResponseCache
+
+SYSTEM_PROMPT = "ты бот"
+
+
+def turn(role: str, content: str) -> dict:
+    return {"role": role, "content": content}
+
+
+def test_same_last_message_with_different_history_misses():
+    cache = ResponseCache(reuse_probability=1.0)
+    about_games = [turn("user", "вася: го в доту"), turn("assistant", "я за"), turn("user", "вася: да")]
+    about_weather = [turn("user", "петя: завтра дождь?"), turn("assistant", "похоже"), turn("user", "петя: да")]
+
+    cache.put(cache.key(SYSTEM_PROMPT, about_games), "погнали")
+    assert cache.key(SYSTEM_PROMPT, about_games) != cache.key(SYSTEM_PROMPT, about_weather)
+    assert cache.get(2, cache.key(SYSTEM_PROMPT, about_weather)) is None
+    assert cache.get(1, cache.key(SYSTEM_PROMPT, about_games)) == "погнали"
+
+
+def test_summary_is_part_of_the_key():
+    cache = ResponseCache()
+    messages = [turn("user", "вася: привет")]
+    with_summary = [turn("system", "Краткое содержание более раннего разговора: спорили о футболе")] + messages
+    assert cache.key(SYSTEM_PROMPT, messages) != cache.key(SYSTEM_PROMPT, with_summary)
+
+
+def test_long_user_turns_are_not_cached():
+    cache = ResponseCache(max_prompt_chars=20)
+    assert cache.key(SYSTEM_PROMPT, [turn("user", "вася: " + "очень длинная реплика " * 5)]) is None
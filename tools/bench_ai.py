@@ -0,0 +1,224 @@
+"""Нагрузочный прогон ИИ-кога на заглушке вместо настоящего API.
+
+Поднимает одну или две заглушки (tools/stub_llm.py), создаёт AI-ког без подключения к Discord и к БД
+и шлёт в AI.on_message сообщения от имени N каналов. В конце печатает перцентили задержки
+от сообщения до ответа, число запросов к API на сообщение и глубину очередей во времени.
+
+    python -m tools.bench_ai --channels 50 --duration 60 --rate 0.3
+    python -m tools.bench_ai --stubs 2 --latency lognormal:2,0.8 --error-rate 0.1
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+from types import SimpleNamespace
+from contextlib import asynccontextmanager
+
+from tools.stub_llm import StubConfig, start_stub
+
+CHATTER = ("привет", "бот ты тут?", "ахаха", "кто играет сегодня", "скинь мем", "ну и жара", "го в войс",
+           "какой сегодня день", "лол", "бро ты серьёзно?")
+
+
+class FakeUser:
+    bot = False
+
+    def __init__(self, user_id: int):
+        self.id = user_id
+        self.display_name = f"user{user_id}"
+
+
+class FakeChannel:
+    def __init__(self, channel_id: int, bench: "Bench"):
+        self.id = channel_id
+        self.bench = bench
+
+    @asynccontextmanager
+    async def typing(self):
+        yield
+
+
+class FakeMessage:
+    """То, что AI-ког читает у discord.Message: author, guild, channel, content, reply и edit."""
+
+    guild = True
+
+    def __init__(self, channel: FakeChannel, author: FakeUser, content: str):
+        self.channel = channel
+        self.author = author
+        self.content = content
+        self.sent_at = time.perf_counter()
+
+    async def reply(self, content: str, mention_author: bool = True) -> "FakeMessage":
+        self.channel.bench.on_reply(self.channel.id)
+        return FakeMessage(self.channel, FakeUser(0), content)
+
+    async def edit(self, content: str):
+        self.channel.bench.edits += 1
+
+
+class MemoryConversationDatabase:
+    """Хранилище историй в памяти вместо Postgres, тот же интерфейс, что у ConversationDatabase."""
+
+    def __init__(self):
+        self.rows: dict[int, dict] = {}
+
+    async def get_conversation(self, channel_id: int):
+        row = self.rows.get(channel_id)
+        return SimpleNamespace(**row) if row else None
+
+    async def save_conversations(self, rows: list[dict]):
+        for row in rows:
+            self.rows[row["channel_id"]] = row
+
+    async def delete_conversation(self, channel_id: int):
+        self.rows.pop(channel_id, None)
+
+
+class Bench:
+    def __init__(self):
+        self.pending: dict[int, list[float]] = {}  # канал -> время отправки ещё не отвеченных сообщений
+        self.latencies: list[float] = []
+        self.messages = 0
+        self.replies = 0
+        self.edits = 0
+        self.depth_samples: list[tuple[float, int]] = []
+
+    def on_reply(self, channel_id: int):
+        # Ответ закрывает все сообщения канала, пришедшие до него: они ушли одной пачкой
+        now = time.perf_counter()
+        self.replies += 1
+        self.latencies.extend(now - sent for sent in self.pending.pop(channel_id, []))
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def run(args):
+    stub_config = StubConfig(args.latency, args.error_rate, args.error_status, reply_words=args.reply_words,
+                             chunk_delay=args.chunk_delay)
+    stubs = [await start_stub(stub_config) for _ in range(args.stubs)]
+
+    # Настройки кога читаются из окружения при импорте
+    os.environ["AI_TOKEN"] = "stub"
+    os.environ["AI_API_URL"] = stubs[0][1]
+    os.environ["AI_STREAMING"] = "true" if args.streaming else "false"
+    os.environ["AI_REQUESTS_PER_MINUTE"] = str(args.rpm)
+    os.environ["AI_MAX_CONCURRENT"] = str(args.concurrency)
+    from cogs.ai import ai as ai_module
+    from cogs.ai._memory import ConversationStore
+    from cogs.ai._providers import Provider, ProviderPool
+
+    cog = ai_module.AI(bot=None)
+    cog.channel_settings = {str(channel_id): {"enabled": True, "response_cache": args.cache}
+                            for channel_id in range(1, args.channels + 1)}
+    cog.save_channel_settings = lambda: None
+    cog.conversations = ConversationStore(MemoryConversationDatabase(), ai_module.MEMORY_MAX_CHANNELS,
+                                          ai_module.MEMORY_IDLE_TTL, ai_module.MEMORY_FLUSH_INTERVAL)
+    cog.providers = ProviderPool(
+        [Provider(f"stub{i + 1}", url, "stub", "stub-model") for i, (_, url) in enumerate(stubs)],
+        hedging=args.hedging,
+    )
+    cog.http = ai_module.create_http_client()
+    cog.conversations.start()
+    cog.scheduler.start()
+
+    bench = Bench()
+    channels = [FakeChannel(channel_id, bench) for channel_id in range(1, args.channels + 1)]
+    started = time.perf_counter()
+
+    async def channel_traffic(channel: FakeChannel):
+        while time.perf_counter() - started < args.duration:
+            # Пуассоновский поток: экспоненциальные паузы между сообщениями
+            await asyncio.sleep(random.expovariate(args.rate))
+            message = FakeMessage(channel, FakeUser(random.randint(1, 20)), random.choice(CHATTER))
+            bench.pending.setdefault(channel.id, []).append(message.sent_at)
+            bench.messages += 1
+            await cog.on_message(message)
+
+    async def sample_depth():
+        while True:
+            bench.depth_samples.append((time.perf_counter() - started, cog.scheduler.depth))
+            await asyncio.sleep(1.0)
+
+    sampler = asyncio.create_task(sample_depth())
+    await asyncio.gather(*(channel_traffic(channel) for channel in channels))
+    # Даём догнать хвост очередей
+    drain_deadline = time.perf_counter() + args.drain
+    while (cog.scheduler.depth or cog.scheduler.in_flight) and time.perf_counter() < drain_deadline:
+        await asyncio.sleep(0.2)
+    sampler.cancel()
+
+    await cog.scheduler.stop()
+    await cog.conversations.stop()
+    await cog.http.aclose()
+    stub_stats = [runner.app["stats"] for runner, _ in stubs]
+    for runner, _ in stubs:
+        await runner.cleanup()
+
+    report(args, bench, cog, stub_stats, time.perf_counter() - started)
+
+
+def report(args, bench: Bench, cog, stub_stats, elapsed: float):
+    api_calls = sum(stats.requests for stats in stub_stats)
+    unanswered = sum(len(sent) for sent in bench.pending.values())
+    print(f"Каналов {args.channels}, {args.rate} сообщ./с на канал, {elapsed:.0f} с, "
+          f"стриминг {'вкл' if args.streaming else 'выкл'}, заглушек {args.stubs}")
+    print(f"Сообщений {bench.messages}, ответов {bench.replies}, без ответа {unanswered}, "
+          f"отброшено очередями {cog.scheduler.dropped}, правок {bench.edits}")
+    print(f"Запросов к API {api_calls} ({api_calls / max(1, bench.messages):.2f} на сообщение), "
+          f"сообщений на ответ {bench.messages / max(1, bench.replies):.2f}")
+    for i, stats in enumerate(stub_stats, start=1):
+        print(f"  stub{i}: {stats.as_dict()}")
+
+    if bench.latencies:
+        print("Задержка сообщение → ответ: "
+              f"p50 {percentile(bench.latencies, 0.5):.2f} с, p90 {percentile(bench.latencies, 0.9):.2f} с, "
+              f"p99 {percentile(bench.latencies, 0.99):.2f} с, макс {max(bench.latencies):.2f} с, "
+              f"среднее {statistics.fmean(bench.latencies):.2f} с")
+
+    depths = [depth for _, depth in bench.depth_samples]
+    if depths:
+        print(f"Глубина очередей: среднее {statistics.fmean(depths):.1f}, макс {max(depths)}")
+        step = max(1, len(bench.depth_samples) // 20)
+        print("  " + " ".join(f"{t:.0f}с:{depth}" for t, depth in bench.depth_samples[::step]))
+
+    print(f"Планировщик: {cog.scheduler.summary()}")
+    print(f"Провайдеры: {cog.providers.summary()}")
+    for provider in cog.providers.providers:
+        print(f"  {provider.summary()}")
+    print(f"Кэш: {cog.cache.summary()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--channels", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=60.0, help="секунд подачи сообщений")
+    parser.add_argument("--rate", type=float, default=0.3, help="сообщений в секунду на канал")
+    parser.add_argument("--drain", type=float, default=60.0, help="сколько ждать разбора очередей после подачи")
+    parser.add_argument("--stubs", type=int, default=1, choices=(1, 2))
+    parser.add_argument("--rpm", type=int, default=600, help="лимит запросов в минуту планировщика")
+    parser.add_argument("--concurrency", type=int, default=4, help="одновременных запросов к API")
+    parser.add_argument("--latency", default="lognormal:1.5,0.5")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--reply-words", type=int, default=30)
+    parser.add_argument("--chunk-delay", type=float, default=0.05)
+    parser.add_argument("--no-streaming", dest="streaming", action="store_false")
+    parser.add_argument("--no-hedging", dest="hedging", action="store_false")
+    parser.add_argument("--cache", action="store_true", help="включить кэш ответов во всех каналах")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    if args.seed is not None:
+        random.seed(args.seed)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Локальный OpenAI-совместимый сервер-заглушка для нагрузочных тестов ИИ-кога.
+
+Отвечает на POST /v1/chat/completions (обычный ответ и SSE при stream: true) с настраиваемой
+задержкой и долей ошибок. GET /stats — счётчики запросов.
+
+    python -m tools.stub_llm --port 8081 --latency lognormal:1.5,0.5 --error-rate 0.05
+
+Чтобы направить на него бота: AI_API_URL=http://127.0.0.1:8081/v1 и любой AI_TOKEN.
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+from aiohttp import web
+
+WORDS = ("бро", "ну", "ты", "реально", "капитан", "уточка", "шторм", "ванная", "адмирал", "флот", "💀", "🗿")
+
+
+def parse_latency(spec: str):
+    """fixed:1.2 | uniform:0.5,3 | lognormal:медиана,сигма — возвращает функцию выборки в секундах."""
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    if kind == "fixed":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "lognormal":
+        median, sigma = values
+        return lambda: random.lognormvariate(math.log(median), sigma)
+    raise ValueError(f"Неизвестное распределение задержки: {spec}")
+
+
+@dataclass
+class StubConfig:
+    latency: str = "lognormal:1.5,0.5"  # до ответа или до первого куска
+    error_rate: float = 0.0
+    error_status: int = 503
+    retry_after: float | None = None
+    reply_words: int = 30
+    chunk_delay: float = 0.05  # между кусками при стриминге
+    name: str = "stub"
+
+
+@dataclass
+class StubStats:
+    requests: int = 0
+    streamed: int = 0
+    errors: int = 0
+    in_flight: int = 0
+    max_in_flight: int = 0
+    # По началу системного промпта: ответы и конспекты считаются отдельно
+    by_prompt: Counter = field(default_factory=Counter)
+
+    def as_dict(self) -> dict:
+        return {"requests": self.requests, "streamed": self.streamed, "errors": self.errors,
+                "max_in_flight": self.max_in_flight, "by_prompt": dict(self.by_prompt)}
+
+
+def create_app(config: StubConfig) -> web.Application:
+    sample_latency = parse_latency(config.latency)
+    stats = StubStats()
+
+    def make_reply() -> str:
+        return " ".join(random.choice(WORDS) for _ in range(config.reply_words))
+
+    async def completions(request: web.Request) -> web.StreamResponse:
+        payload = await request.json()
+        stats.requests += 1
+        system = next((m["content"] for m in payload.get("messages", []) if m["role"] == "system"), "")
+        stats.by_prompt[system[:40]] += 1
+        stats.in_flight += 1
+        stats.max_in_flight = max(stats.max_in_flight, stats.in_flight)
+        try:
+            await asyncio.sleep(sample_latency())
+            if random.random() < config.error_rate:
+                stats.errors += 1
+                headers = {"Retry-After": str(config.retry_after)} if config.retry_after is not None else None
+                return web.json_response({"error": {"message": "stub overloaded"}}, status=config.error_status,
+                                         headers=headers)
+
+            reply = make_reply()
+            created = int(time.time())
+            if not payload.get("stream"):
+                return web.json_response({
+                    "id": f"stub-{stats.requests}", "object": "chat.completion", "created": created,
+                    "model": payload.get("model", config.name),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": reply},
+                                 "finish_reason": "stop"}],
+                })
+
+            stats.streamed += 1
+            response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+            await response.prepare(request)
+            for word in reply.split(" "):
+                chunk = {"id": f"stub-{stats.requests}", "object": "chat.completion.chunk", "created": created,
+                         "choices": [{"index": 0, "delta": {"content": word + " "}}]}
+                await response.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode())
+                await asyncio.sleep(config.chunk_delay)
+            await response.write(b"data: [DONE]\n\n")
+            await response.write_eof()
+            return response
+        finally:
+            stats.in_flight -= 1
+
+    async def get_stats(request: web.Request) -> web.Response:
+        return web.json_response(stats.as_dict())
+
+    app = web.Application()
+    app["stats"] = stats
+    app.router.add_post("/v1/chat/completions", completions)
+    app.router.add_post("/chat/completions", completions)
+    app.router.add_get("/stats", get_stats)
+    return app
+
+
+async def start_stub(config: StubConfig, host: str = "127.0.0.1", port: int = 0) -> tuple[web.AppRunner, str]:
+    """Запускает заглушку в текущем цикле событий. Возвращает (runner, базовый URL для AI_API_URL)."""
+    app = create_app(config)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, f"http://{host}:{port}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", default=StubConfig.latency, help="fixed:X | uniform:A,B | lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--retry-after", type=float, default=None)
+    parser.add_argument("--reply-words", type=int, default=30)
+    parser.add_argument("--chunk-delay", type=float, default=0.05)
+    args = parser.parse_args()
+
+    config = StubConfig(args.latency, args.error_rate, args.error_status, args.retry_after,
+                        args.reply_words, args.chunk_delay)
+    web.run_app(create_app(config), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()